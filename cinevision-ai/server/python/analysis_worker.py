@@ -0,0 +1,269 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict
+
+import llm_cache
+import result_cache
+from script_analyzer import SECTIONS, analyze_script
+
+# Analysis tasks run in the process pool; each takes the script text
+ANALYZERS: Dict[str, Callable] = dict(SECTIONS, all=analyze_script)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+MAX_SIMULATION_TRIALS = 1000000
+
+output_lock = threading.Lock()
+
+
+def send(message: Dict):
+    """Write one JSON message per line to stdout"""
+    with output_lock:
+        sys.stdout.write(json.dumps(message) + '\n')
+        sys.stdout.flush()
+
+
+def pool_context():
+    """Fork pool processes from a small server process started before the storyboard generator is imported"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['script_analyzer'])
+        return context
+    return multiprocessing.get_context()
+
+
+def init_pool_process():
+    # Results are cached by the parent so hit/miss counters live in one place
+    result_cache.configure(enabled=False)
+
+
+def run_analysis(task: str, script_text: str):
+    """Entry point executed inside a pool process"""
+    return ANALYZERS[task](script_text)
+
+
+def run_budget_simulation(script_text: str, budget, options: Dict) -> Dict:
+    """Point-estimate budget (computed unless already cached) plus its Monte Carlo spread"""
+    from budget_simulation import simulate_budget
+
+    if budget is None:
+        budget = SECTIONS['budget'](script_text)
+    return {'budget': budget, 'simulation': simulate_budget(budget, **options)}
+
+
+def simulation_options(request: Dict) -> Dict:
+    """Validated ``trials`` and ``seed`` from a budget_simulation request; raises ValueError"""
+    options = request.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError('Simulation options must be an object')
+
+    selected = {}
+    for key in ('trials', 'seed'):
+        value = options.get(key)
+        if value is None:
+            continue
+        # bool is an int subclass, and int() would quietly truncate floats
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f'Simulation option {key} must be an integer')
+        try:
+            selected[key] = int(value)
+        except ValueError:
+            raise ValueError(f'Simulation option {key} must be an integer') from None
+    if 'trials' in selected:
+        selected['trials'] = min(max(1, selected['trials']), MAX_SIMULATION_TRIALS)
+    return selected
+
+
+def cached_sections(task: str, script_text: str) -> Dict:
+    """Look up every analyzer section a task needs in the result cache"""
+    names = list(SECTIONS) if task == 'all' else [task]
+    return {name: result_cache.lookup(SECTIONS[name], script_text) for name in names}
+
+
+def store_sections(task: str, script_text: str, result):
+    """Cache a finished analysis; a failed write (locked or full disk) only costs a recompute later"""
+    sections = result if task == 'all' else {task: result}
+    try:
+        for name, section in sections.items():
+            result_cache.store(SECTIONS[name], script_text, section)
+    except Exception:
+        print(f'Could not cache {task} result:', file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+
+
+def load_storyboard_generator():
+    """Import the storyboard generator once; it needs the OpenAI key at import time"""
+    try:
+        import storyboard_generator
+        return storyboard_generator, None
+    except Exception as e:
+        return None, str(e)
+
+
+class AnalysisWorker:
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = workers
+        self.pool_lock = threading.Lock()
+        # Analyzers are CPU bound, so they get their own processes
+        self.analysis_pool = self.new_analysis_pool()
+        # Start the pool processes now so the first request does not pay for it
+        for future in [self.analysis_pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+        # Storyboards mostly wait on the network and stream progress back
+        self.storyboard_pool = ThreadPoolExecutor(max_workers=workers)
+        self.storyboard_generator, self.storyboard_error = load_storyboard_generator()
+
+    def new_analysis_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context(), initializer=init_pool_process)
+
+    def replace_analysis_pool(self, broken: ProcessPoolExecutor):
+        """Swap a broken pool for a new one; every job that saw it break asks, the first one wins"""
+        with self.pool_lock:
+            if self.analysis_pool is broken:
+                print('An analysis process died; starting a new pool', file=sys.stderr)
+                self.analysis_pool = self.new_analysis_pool()
+                broken.shutdown(wait=False)
+
+    def submit_analysis(self, fn: Callable, args: tuple, done: Callable[[Future], None], retries: int = 1):
+        """Run ``fn(*args)`` in the analysis pool and pass the finished future to ``done``.
+
+        A pool process that dies (OOM kill, segfault) breaks the whole pool and
+        fails every job in it, so the pool is replaced and each of those jobs
+        is tried again, at most ``retries`` times.
+        """
+        pool = self.analysis_pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # An earlier job took the pool down; this one never ran
+            self.replace_analysis_pool(pool)
+            self.submit_analysis(fn, args, done, retries)
+            return
+
+        def settle(f):
+            if retries and isinstance(f.exception(), BrokenProcessPool):
+                self.replace_analysis_pool(pool)
+                self.submit_analysis(fn, args, done, retries - 1)
+            else:
+                done(f)
+
+        future.add_done_callback(settle)
+
+    def handle(self, request: Dict):
+        job_id = request.get('id')
+        task = request.get('task')
+        script_text = request.get('scriptText')
+
+        if task == 'cache_stats':
+            stats = dict(result_cache.cache_stats(), llm_responses=llm_cache.cache_stats())
+            send({'id': job_id, 'type': 'result', 'result': stats})
+        elif not isinstance(script_text, str):
+            send({'id': job_id, 'type': 'error', 'error': 'No script text provided'})
+        elif task in ANALYZERS:
+            self.run_cached(job_id, task, script_text)
+        elif task == 'budget_simulation':
+            try:
+                options = simulation_options(request)
+            except ValueError as e:
+                send({'id': job_id, 'type': 'error', 'error': str(e)})
+                return
+            self.run_budget_simulation(job_id, script_text, options)
+        elif task == 'storyboard':
+            future = self.storyboard_pool.submit(self.run_storyboard, job_id, script_text, request.get('outputDir'))
+            future.add_done_callback(lambda f: self.finish(job_id, f))
+        else:
+            send({'id': job_id, 'type': 'error', 'error': f'Unknown task: {task}'})
+
+    def run_cached(self, job_id, task: str, script_text: str):
+        sections = cached_sections(task, script_text)
+        if result_cache.MISS not in sections.values():
+            send({'id': job_id, 'type': 'result', 'result': sections if task == 'all' else sections[task]})
+            return
+
+        def done(f):
+            try:
+                if f.exception() is None:
+                    store_sections(task, script_text, f.result())
+            finally:
+                self.finish(job_id, f)
+
+        self.submit_analysis(run_analysis, (task, script_text), done)
+
+    def run_budget_simulation(self, job_id, script_text: str, options: Dict):
+        budget = result_cache.lookup(SECTIONS['budget'], script_text)
+        cached = budget is not result_cache.MISS
+        def done(f):
+            try:
+                if f.exception() is None and not cached:
+                    store_sections('budget', script_text, f.result()['budget'])
+            finally:
+                self.finish(job_id, f)
+
+        self.submit_analysis(run_budget_simulation, (script_text, budget if cached else None, options), done)
+
+    def run_storyboard(self, job_id, script_text: str, output_dir: str):
+        if self.storyboard_generator is None:
+            raise RuntimeError(f'Storyboard generator unavailable: {self.storyboard_error}')
+
+        def emit(event: Dict):
+            send({'id': job_id, 'type': 'progress', 'data': event})
+
+        return self.storyboard_generator.generate_storyboard(
+            None, output_dir, script_text=script_text, emit=emit
+        )
+
+    def finish(self, job_id, future):
+        try:
+            send({'id': job_id, 'type': 'result', 'result': future.result()})
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            send({'id': job_id, 'type': 'error', 'error': str(e)})
+
+    def serve(self, stream):
+        """Read JSON-lines requests until stdin closes"""
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({'id': None, 'type': 'error', 'error': f'Invalid request: {e}'})
+                continue
+            if not isinstance(request, dict):
+                send({'id': None, 'type': 'error', 'error': 'Invalid request: expected a JSON object'})
+                continue
+            # A bad request fails on its own; the worker keeps serving everything else
+            try:
+                self.handle(request)
+            except Exception as e:
+                traceback.print_exc(file=sys.stderr)
+                send({'id': request.get('id'), 'type': 'error', 'error': str(e)})
+
+    def shutdown(self):
+        self.analysis_pool.shutdown()
+        self.storyboard_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-lived screenplay analysis worker (JSON lines over stdin/stdout)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of analysis processes')
+
+    args = parser.parse_args()
+
+    worker = AnalysisWorker(max(1, args.workers))
+    send({'id': None, 'type': 'ready', 'tasks': list(ANALYZERS) + ['budget_simulation', 'storyboard', 'cache_stats']})
+    try:
+        worker.serve(sys.stdin)
+    finally:
+        worker.shutdown()
+
+if __name__ == "__main__":
+    main()
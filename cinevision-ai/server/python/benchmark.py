@@ -0,0 +1,175 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import result_cache
+import scene_cache
+from budget_analyzer import analyze_budget
+from camera_analyzer import analyze_camera_requirements
+from character_analyzer import analyze_characters
+from suggestions_analyzer import analyze_production_suggestions
+from synthetic_screenplay import generate_screenplay
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_THRESHOLD = 0.2
+
+
+def load_parse_screenplay():
+    """parse_screenplay lives in the storyboard generator, which needs an API key at import"""
+    try:
+        from storyboard_generator import parse_screenplay
+        return parse_screenplay, None
+    except Exception as e:
+        return None, str(e)
+
+
+def benchmark_targets() -> Dict[str, Callable]:
+    """Functions to time, by name; a string in place of a function is the reason it is skipped"""
+    parse_screenplay, error = load_parse_screenplay()
+
+    return {
+        'analyze_characters': analyze_characters,
+        'analyze_budget': analyze_budget,
+        'analyze_camera_requirements': analyze_camera_requirements,
+        'analyze_production_suggestions': analyze_production_suggestions,
+        'parse_screenplay': parse_screenplay or error
+    }
+
+
+def cold_run(func: Callable, script_text: str):
+    # Every run starts without per-scene memos so sizes are comparable
+    scene_cache.get_cache().clear()
+    return func(script_text)
+
+
+def measure(func: Callable, script_text: str, scenes: int, repeat: int) -> Dict:
+    """Best wall time over ``repeat`` runs, then peak traced memory from one extra run"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cold_run(func, script_text)
+        timings.append(time.perf_counter() - start)
+
+    # tracemalloc slows allocation down a lot, so it never overlaps the timed runs
+    tracemalloc.start()
+    cold_run(func, script_text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(timings)
+    megabytes = len(script_text.encode('utf-8')) / (1024 * 1024)
+    return {
+        'seconds': best,
+        'scenes_per_second': scenes / best if best else None,
+        'mb_per_second': megabytes / best if best else None,
+        'peak_memory_mb': peak / (1024 * 1024)
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int = 3, only: Optional[List[str]] = None, seed: int = 0) -> Dict:
+    result_cache.configure(enabled=False)
+    # Memory only, so clearing it really makes every run cold
+    scene_cache.configure(path='')
+    targets = benchmark_targets()
+
+    results = {}
+    for scenes in sizes:
+        script_text = generate_screenplay(scenes, seed=seed)
+        size_results = {
+            'bytes': len(script_text.encode('utf-8')),
+            'analyzers': {}
+        }
+
+        for name, func in targets.items():
+            if only and name not in only:
+                continue
+            if isinstance(func, str):
+                size_results['analyzers'][name] = {'skipped': func}
+                continue
+            size_results['analyzers'][name] = measure(func, script_text, scenes, repeat)
+            print(f'{name} @ {scenes} scenes: {size_results["analyzers"][name]["seconds"]:.4f}s', file=sys.stderr)
+
+        results[str(scenes)] = size_results
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'results': results
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Attach the speedup over the baseline to every measurement and return the regressions.
+
+    A measurement regresses when it is more than ``threshold`` (a fraction)
+    slower than the baseline for the same analyzer and script size.
+    """
+    regressions = []
+
+    for scenes, size_results in report['results'].items():
+        baseline_size = baseline.get('results', {}).get(scenes, {}).get('analyzers', {})
+
+        for name, current in size_results['analyzers'].items():
+            previous = baseline_size.get(name)
+            if current.get('skipped') or not previous or previous.get('skipped'):
+                continue
+
+            current['baseline_seconds'] = previous['seconds']
+            current['speedup'] = previous['seconds'] / current['seconds'] if current['seconds'] else None
+
+            if current['seconds'] > previous['seconds'] * (1 + threshold):
+                regressions.append({
+                    'analyzer': name,
+                    'scenes': int(scenes),
+                    'seconds': current['seconds'],
+                    'baseline_seconds': previous['seconds']
+                })
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the screenplay analyzers on synthetic scripts')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Script sizes in scenes')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per measurement (best is kept)')
+    parser.add_argument('--only', nargs='+', help='Only run these analyzers')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic scripts')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare against a previously saved report')
+    parser.add_argument('--save-baseline', help='Also save the report as a baseline to this file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown against the baseline before failing (0.2 = 20%%)')
+
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, max(1, args.repeat), args.only, args.seed)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare_to_baseline(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(output)
+
+    if regressions:
+        print(f'{len(regressions)} measurement(s) slower than the baseline', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
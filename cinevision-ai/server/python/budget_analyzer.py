@@ -1,8 +1,59 @@
-import re
 import json
-from typing import Dict, List, Tuple
+import re
+from typing import Dict, Iterable, List, Tuple, Union
+
+from result_cache import cached_analysis
+from scene_cache import memoize_scene, scene_pieces
+from scene_keywords import keyword_hits, register_keywords, scene_scan
+from screenplay_parser import CHARACTER, is_preamble, scene_block
+
+ANALYZER_VERSION = 1
+
+def init_budget_analysis() -> Dict:
+    # Dicts keep first-seen order so output is stable between runs
+    return {
+        "locations": {},
+        "character_counts": {},
+        "props": {},
+        "effects": {}
+    }
+
+def budget_scene_piece(scene: Dict) -> Dict:
+    """What the budget needs from one scene: its location, speaker cues and prop/effect mentions"""
+    props, effects = find_props_and_effects(scene)
+    return {
+        "location": None if is_preamble(scene) else scene['location'],
+        # Every speaker cue, extensions such as (V.O.) or (CONT'D) stripped, so off-screen voices are cast too
+        "cues": [element['name'] for element in scene['elements'] if element['type'] == CHARACTER],
+        "props": props,
+        "effects": effects
+    }
+
+def add_budget_piece(state: Dict, piece: Dict):
+    """Fold one scene's locations, cast and props/effects into the running totals"""
+    if piece["location"] is not None:
+        state["locations"].setdefault(piece["location"], None)
 
-def analyze_budget(script_text: str) -> Dict:
+    counts = state["character_counts"]
+    for name in piece["cues"]:
+        counts[name] = counts.get(name, 0) + 1
+
+    state["props"].update(dict.fromkeys(piece["props"]))
+    state["effects"].update(dict.fromkeys(piece["effects"]))
+
+def add_budget_scene(state: Dict, scene: Dict):
+    # Scenes whose text has not changed reuse their piece
+    add_budget_piece(state, memoize_scene('budget', ANALYZER_VERSION, scene_block(scene),
+                                          lambda _: budget_scene_piece(scene)))
+
+@cached_analysis('budget', ANALYZER_VERSION)
+def analyze_budget(script: Union[str, Dict, Iterable[str]]) -> Dict:
+    state = init_budget_analysis()
+    for _, piece in scene_pieces(script, 'budget', ANALYZER_VERSION, budget_scene_piece):
+        add_budget_piece(state, piece)
+    return finish_budget_analysis(state)
+
+def finish_budget_analysis(state: Dict) -> Dict:
     # Initialize budget categories
     budget = {
         "cast": {"details": [], "total": 0},
@@ -15,7 +66,7 @@ def analyze_budget(script_text: str) -> Dict:
     }
     
     # Extract scene locations
-    locations = extract_locations(script_text)
+    locations = list(state["locations"])
     for loc in locations:
         cost = estimate_location_cost(loc)
         budget["locations"]["details"].append({
@@ -26,7 +77,7 @@ def analyze_budget(script_text: str) -> Dict:
         budget["locations"]["total"] += cost
 
     # Extract characters for cast budget
-    characters = extract_characters(script_text)
+    characters = categorize_characters(state["character_counts"])
     for char in characters:
         cost = estimate_cast_cost(char["importance"])
         budget["cast"]["details"].append({
@@ -38,7 +89,7 @@ def analyze_budget(script_text: str) -> Dict:
         budget["cast"]["total"] += cost * 5
 
     # Analyze props and special effects
-    props, effects = analyze_props_and_effects(script_text)
+    props, effects = list(state["props"]), list(state["effects"])
     
     for prop in props:
         cost = estimate_prop_cost(prop)
@@ -102,30 +153,7 @@ def analyze_budget(script_text: str) -> Dict:
 
     return budget
 
-def extract_locations(script_text: str) -> List[str]:
-    # Look for scene headings (INT./EXT.)
-    location_pattern = r'(INT\.|EXT\.|INT/EXT\.)\s([A-Z0-9\s\-\']+)[-\s]*?[—\-]'
-    locations = set()
-    
-    for match in re.finditer(location_pattern, script_text, re.MULTILINE):
-        location = match.group(2).strip()
-        locations.add(location)
-    
-    return list(locations)
-
-def extract_characters(script_text: str) -> List[Dict]:
-    # Find character names (in ALL CAPS) followed by dialogue
-    character_pattern = r'^([A-Z][A-Z\s\-\']+)$'
-    characters = {}
-    
-    for match in re.finditer(character_pattern, script_text, re.MULTILINE):
-        name = match.group(1).strip()
-        if name not in ['INT', 'EXT', 'INT/EXT']:
-            if name not in characters:
-                characters[name] = 1
-            else:
-                characters[name] += 1
-
+def categorize_characters(characters: Dict[str, int]) -> List[Dict]:
     # Categorize characters by importance based on dialogue count
     character_list = []
     for name, count in characters.items():
@@ -144,32 +172,55 @@ def extract_characters(script_text: str) -> List[Dict]:
     
     return character_list
 
-def analyze_props_and_effects(script_text: str) -> Tuple[List[str], List[str]]:
-    # Common props and effects keywords
-    prop_keywords = [
-        r'holds|holding|picks up|carrying|puts down|using|uses|with a|wearing',
-        r'gun|sword|phone|book|car|vehicle|weapon|computer|laptop'
-    ]
-    
-    effect_keywords = [
-        r'explosion|fire|rain|storm|lightning|smoke|fog|snow',
-        r'CGI|VFX|special effect|stunt|fight scene|chase scene'
-    ]
-    
-    props = set()
-    effects = set()
-    
-    # Search for props
-    prop_pattern = '|'.join(prop_keywords)
-    for match in re.finditer(prop_pattern, script_text, re.IGNORECASE):
-        props.add(match.group(0).strip())
-    
-    # Search for effects
-    effect_pattern = '|'.join(effect_keywords)
-    for match in re.finditer(effect_pattern, script_text, re.IGNORECASE):
-        effects.add(match.group(0).strip())
-    
-    return list(props), list(effects)
+# Common props and effects keywords, matched case-insensitively anywhere in a scene.
+# Where several start at the same place the one listed first wins, as in a regex alternation.
+PROP_KEYWORDS = [
+    'holds', 'holding', 'picks up', 'carrying', 'puts down', 'using', 'uses', 'with a', 'wearing',
+    'gun', 'sword', 'phone', 'book', 'car', 'vehicle', 'weapon', 'computer', 'laptop'
+]
+
+EFFECT_KEYWORDS = [
+    'explosion', 'fire', 'rain', 'storm', 'lightning', 'smoke', 'fog', 'snow',
+    'CGI', 'VFX', 'special effect', 'stunt', 'fight scene', 'chase scene'
+]
+
+register_keywords('budget_props', PROP_KEYWORDS)
+register_keywords('budget_effects', EFFECT_KEYWORDS)
+
+PROP_PATTERN = re.compile('|'.join(map(re.escape, PROP_KEYWORDS)), re.IGNORECASE)
+EFFECT_PATTERN = re.compile('|'.join(map(re.escape, EFFECT_KEYWORDS)), re.IGNORECASE)
+
+# Letters that match i or s when ignoring case but do not lowercase to them
+CASELESS_ONLY = re.compile('[\u0130\u0131\u017f]')
+
+def find_props_and_effects(scene: Dict) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    # Distinct prop and effect mentions in one scene (as written), in order of appearance
+    scan = scene_scan(scene)
+    text = scan['text']
+    if CASELESS_ONLY.search(text):
+        # The shared scan lowercases the text, which would miss these
+        return pattern_mentions(PROP_PATTERN, text), pattern_mentions(EFFECT_PATTERN, text)
+    return hit_mentions(text, keyword_hits(scene, 'budget_props'), PROP_KEYWORDS), \
+        hit_mentions(text, keyword_hits(scene, 'budget_effects'), EFFECT_KEYWORDS)
+
+def pattern_mentions(pattern: re.Pattern, text: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(match.group(0) for match in pattern.finditer(text)))
+
+def hit_mentions(text: str, hits: List[Tuple[str, int]], keywords: List[str]) -> Tuple[str, ...]:
+    """The mentions pattern_mentions would find, from the keyword hits: leftmost, non-overlapping"""
+    rank = {keyword.lower(): index for index, keyword in enumerate(keywords)}
+    chosen = {}
+    for keyword, position in hits:
+        if position not in chosen or rank[keyword] < rank[chosen[position]]:
+            chosen[position] = keyword
+
+    found = {}
+    end = 0
+    for position, keyword in chosen.items():
+        if position >= end:
+            end = position + len(keyword)
+            found.setdefault(text[position:end], None)
+    return tuple(found)
 
 def estimate_location_cost(location: str) -> int:
     # Basic location cost estimation
@@ -232,7 +283,6 @@ if __name__ == "__main__":
         sys.exit(1)
         
     with open(sys.argv[1], 'r') as f:
-        script_text = f.read()
-        
-    budget = analyze_budget(script_text)
+        budget = analyze_budget(f)
+
     print(json.dumps(budget, indent=2))
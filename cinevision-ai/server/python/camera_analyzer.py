@@ -1,9 +1,115 @@
-import re
+import copy
 import json
-from typing import Dict, List
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-def analyze_camera_requirements(script_text: str) -> Dict:
-    analysis = {
+from result_cache import cached_analysis
+from scene_cache import memoize_scene, scene_pieces
+from scene_keywords import keyword_hits, register_keywords
+from screenplay_parser import is_preamble, scene_block
+
+ANALYZER_VERSION = 2
+
+# Shot cues: any keyword (matched case-insensitively anywhere in the scene)
+# adds the requirement to the given section of the scene analysis
+CAMERA_RULES = [
+    {
+        'name': 'close_up',
+        'keywords': ['close up', 'closeup', 'close-up'],
+        'section': 'camera_requirements',
+        'requirement': {'type': 'prime lens', 'suggestion': '50mm or 85mm prime lens for close-up shots'}
+    },
+    {
+        'name': 'wide',
+        'keywords': ['wide', 'establishing', 'landscape'],
+        'section': 'camera_requirements',
+        'requirement': {'type': 'wide lens', 'suggestion': '16-35mm lens for wide shots'}
+    },
+    {
+        'name': 'tracking',
+        'keywords': ['follows', 'tracking', 'moving', 'walks', 'runs'],
+        'section': 'movement_requirements',
+        'requirement': {'type': 'tracking', 'equipment': ['Dolly', 'Steadicam']}
+    },
+    {
+        'name': 'aerial',
+        'keywords': ['aerial', 'bird', 'overhead'],
+        'section': 'special_requirements',
+        'requirement': {'type': 'aerial', 'equipment': ['Drone', 'Crane']}
+    },
+    {
+        'name': 'action',
+        'keywords': ['fight', 'chase', 'action', 'explosion'],
+        'section': 'camera_requirements',
+        'requirement': {'type': 'action', 'suggestion': 'High-speed camera capable of 120fps or higher'}
+    }
+]
+
+# Optional rules for specialised shoots, enabled with CAMERA_RULE_PACKS=underwater,car_rigs
+RULE_PACKS = {
+    'underwater': [
+        {
+            'name': 'underwater',
+            'keywords': ['underwater', 'submerged', 'beneath the surface', 'dives into'],
+            'section': 'special_requirements',
+            'requirement': {'type': 'underwater', 'equipment': ['Underwater housing', 'Dive safety team']}
+        }
+    ],
+    'car_rigs': [
+        {
+            'name': 'car_rig',
+            'keywords': ['driving', 'drives', 'behind the wheel', 'passenger seat'],
+            'section': 'movement_requirements',
+            'requirement': {'type': 'vehicle rig', 'equipment': ['Car mount', 'Hostess tray', 'Process trailer']}
+        }
+    ],
+    'motion_control': [
+        {
+            'name': 'motion_control',
+            'keywords': ['motion control', 'repeat pass', 'time-lapse', 'timelapse'],
+            'section': 'special_requirements',
+            'requirement': {'type': 'motion control', 'equipment': ['Motion control rig']}
+        }
+    ]
+}
+
+def compile_camera_rules(rules: List[Dict]) -> Dict:
+    """Index a rule table by keyword so every rule is checked off the shared keyword scan"""
+    keyword_rules = {}
+    for rule in rules:
+        for keyword in rule['keywords']:
+            keyword_rules.setdefault(keyword.lower(), []).append(rule['name'])
+
+    return {
+        'rules': rules,
+        'by_name': {rule['name']: rule for rule in rules},
+        'keyword_rules': keyword_rules
+    }
+
+def enabled_rule_packs() -> List[str]:
+    """Packs named in CAMERA_RULE_PACKS; unknown names are reported and skipped.
+
+    This runs at import time, so raising would take down every analyzer
+    (and the analysis worker) over a typo in one optional setting.
+    """
+    packs = [name.strip() for name in os.getenv('CAMERA_RULE_PACKS', '').split(',') if name.strip()]
+    unknown = [name for name in packs if name not in RULE_PACKS]
+    if unknown:
+        print(f"Ignoring unknown camera rule packs: {', '.join(unknown)} "
+              f"(available: {', '.join(RULE_PACKS)})", file=sys.stderr)
+    return [name for name in packs if name in RULE_PACKS]
+
+ACTIVE_PACKS = enabled_rule_packs()
+COMPILED_RULES = compile_camera_rules(CAMERA_RULES + [rule for pack in ACTIVE_PACKS for rule in RULE_PACKS[pack]])
+
+register_keywords('camera', COMPILED_RULES['keyword_rules'])
+
+# Cached results depend on which packs were active
+RULES_VERSION = '+'.join([str(ANALYZER_VERSION)] + ACTIVE_PACKS)
+
+def init_camera_analysis() -> Dict:
+    return {
         "scenes": [],
         "camera_setups": {
             "primary": {},
@@ -14,63 +120,46 @@ def analyze_camera_requirements(script_text: str) -> Dict:
         "movement_equipment": [],
         "recommendations": []
     }
+
+def add_camera_scene(analysis: Dict, scene: Dict):
+    """Analyze one scene and fold it into the script-wide setups"""
+    if is_preamble(scene):
+        return
+
+    # Scenes whose text has not changed reuse their analysis
+    add_scene_analysis(analysis, memoize_scene('camera', RULES_VERSION, scene_block(scene), lambda _: analyze_scene(scene)))
+
+def add_scene_analysis(analysis: Dict, scene_analysis: Dict):
+    analysis["scenes"].append(scene_analysis)
+    
+    # Add camera recommendations based on scene
+    add_camera_recommendations(analysis["camera_setups"], scene_analysis)
+    
+    # Add lighting setup based on scene
+    add_lighting_recommendations(analysis["lighting_setups"], scene_analysis)
+    
+    # Add movement equipment based on scene
+    add_movement_recommendations(analysis["movement_equipment"], scene_analysis)
+
+@cached_analysis('camera', RULES_VERSION)
+def analyze_camera_requirements(script: Union[str, Dict, Iterable[str]]) -> Dict:
+    analysis = init_camera_analysis()
     
     # Analyze scenes
-    scenes = extract_scenes(script_text)
-    for scene in scenes:
-        scene_analysis = analyze_scene(scene)
-        analysis["scenes"].append(scene_analysis)
-        
-        # Add camera recommendations based on scene
-        add_camera_recommendations(analysis["camera_setups"], scene_analysis)
-        
-        # Add lighting setup based on scene
-        add_lighting_recommendations(analysis["lighting_setups"], scene_analysis)
-        
-        # Add movement equipment based on scene
-        add_movement_recommendations(analysis["movement_equipment"], scene_analysis)
+    for number, scene_analysis in scene_pieces(script, 'camera', RULES_VERSION, camera_scene_piece):
+        if number:
+            add_scene_analysis(analysis, scene_analysis)
     
+    return finish_camera_analysis(analysis)
+
+def finish_camera_analysis(analysis: Dict) -> Dict:
     # Generate overall recommendations
     generate_overall_recommendations(analysis)
     
     return analysis
 
-def extract_scenes(script_text: str) -> List[Dict]:
-    scenes = []
-    
-    # Look for scene headings
-    scene_pattern = r'(INT\.|EXT\.|INT\/EXT\.)\s+(.+?)(?=\n|$)'
-    time_pattern = r'(?:DAWN|DAY|DUSK|NIGHT|MORNING|AFTERNOON|EVENING)'
-    
-    current_scene = None
-    current_scene_text = []
-    
-    for line in script_text.split('\n'):
-        scene_match = re.match(scene_pattern, line)
-        if scene_match:
-            if current_scene:
-                current_scene['content'] = '\n'.join(current_scene_text)
-                scenes.append(current_scene)
-            
-            location_time = scene_match.group(2)
-            time_match = re.search(time_pattern, location_time)
-            
-            current_scene = {
-                'location_type': scene_match.group(1),
-                'location': location_time.split('-')[0].strip() if '-' in location_time else location_time,
-                'time': time_match.group(0) if time_match else 'DAY',
-                'content': ''
-            }
-            current_scene_text = []
-        else:
-            if current_scene:
-                current_scene_text.append(line)
-    
-    if current_scene:
-        current_scene['content'] = '\n'.join(current_scene_text)
-        scenes.append(current_scene)
-    
-    return scenes
+def camera_scene_piece(scene: Dict) -> Optional[Dict]:
+    return None if is_preamble(scene) else analyze_scene(scene)
 
 def analyze_scene(scene: Dict) -> Dict:
     analysis = {
@@ -80,10 +169,11 @@ def analyze_scene(scene: Dict) -> Dict:
         'camera_requirements': [],
         'lighting_requirements': [],
         'movement_requirements': [],
-        'special_requirements': []
+        'special_requirements': [],
+        'cue_hits': []
     }
     
-    content = scene['content'].lower()
+    hits = scene_cues(scene)
     
     # Analyze based on location type
     if scene['location_type'] == 'INT.':
@@ -97,42 +187,33 @@ def analyze_scene(scene: Dict) -> Dict:
             'setup': get_outdoor_lighting_setup(scene['time'])
         })
     
-    # Check for specific camera requirements
-    if any(word in content for word in ['close up', 'closeup', 'close-up']):
-        analysis['camera_requirements'].append({
-            'type': 'prime lens',
-            'suggestion': '50mm or 85mm prime lens for close-up shots'
-        })
-    
-    if any(word in content for word in ['wide', 'establishing', 'landscape']):
-        analysis['camera_requirements'].append({
-            'type': 'wide lens',
-            'suggestion': '16-35mm lens for wide shots'
-        })
-    
-    # Check for movement
-    if any(word in content for word in ['follows', 'tracking', 'moving', 'walks', 'runs']):
-        analysis['movement_requirements'].append({
-            'type': 'tracking',
-            'equipment': ['Dolly', 'Steadicam']
-        })
-    
-    # Check for special shots
-    if any(word in content for word in ['aerial', 'bird', 'overhead']):
-        analysis['special_requirements'].append({
-            'type': 'aerial',
-            'equipment': ['Drone', 'Crane']
-        })
-    
-    # Check for action sequences
-    if any(word in content for word in ['fight', 'chase', 'action', 'explosion']):
-        analysis['camera_requirements'].append({
-            'type': 'action',
-            'suggestion': 'High-speed camera capable of 120fps or higher'
-        })
+    # Each rule that fired adds its requirement, in rule table order
+    for name, keyword, position in hits:
+        rule = COMPILED_RULES['by_name'][name]
+        analysis[rule['section']].append(copy.deepcopy(rule['requirement']))
+        analysis['cue_hits'].append({'rule': name, 'keyword': keyword, 'position': position})
     
     return analysis
 
+def scene_cues(scene: Dict) -> Tuple[Tuple[str, str, int], ...]:
+    """(rule, keyword, offset into the scene content) of the first hit of every rule that fires, in rule table order"""
+    if scene['end_line'] == scene['start_line']:
+        return ()
+
+    # Hits are offsets into the lowercased heading, newline and content
+    content_start = len(scene['heading'].lower()) + 1
+    first_hits = {}
+    for keyword, position in keyword_hits(scene, 'camera'):
+        if position < content_start:
+            continue
+        for name in COMPILED_RULES['keyword_rules'][keyword]:
+            if name not in first_hits:
+                first_hits[name] = (name, keyword, position - content_start)
+        if len(first_hits) == len(COMPILED_RULES['rules']):
+            break
+
+    return tuple(first_hits[rule['name']] for rule in COMPILED_RULES['rules'] if rule['name'] in first_hits)
+
 def get_indoor_lighting_setup(time: str) -> Dict:
     setups = {
         'DAY': {
@@ -221,7 +302,7 @@ def generate_overall_recommendations(analysis: Dict):
         recommendations.append({
             'category': 'Lenses',
             'suggestion': 'Mixed lens package required',
-            'details': list(set(analysis['camera_setups']['primary']['lenses']))
+            'details': list(dict.fromkeys(analysis['camera_setups']['primary']['lenses']))
         })
     
     # Lighting recommendations
@@ -242,20 +323,17 @@ def generate_overall_recommendations(analysis: Dict):
         recommendations.append({
             'category': 'Movement',
             'suggestion': 'Camera movement equipment required',
-            'details': list(set(analysis['movement_equipment']))
+            'details': list(dict.fromkeys(analysis['movement_equipment']))
         })
     
     analysis['recommendations'] = recommendations
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) != 2:
         print("Usage: python camera_analyzer.py <script_file>")
         sys.exit(1)
         
     with open(sys.argv[1], 'r') as f:
-        script_text = f.read()
-        
-    analysis = analyze_camera_requirements(script_text)
+        analysis = analyze_camera_requirements(f)
+
     print(json.dumps(analysis, indent=2))
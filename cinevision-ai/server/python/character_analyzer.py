@@ -1,68 +1,158 @@
 import argparse
 import json
-import re
+import sys
 from collections import defaultdict
+from typing import Dict, List, Tuple
 
-def analyze_characters(script_text):
-    """Analyze characters from the screenplay"""
-    characters = defaultdict(lambda: {
-        'name': '',
-        'role': 'Supporting Character',  # Default role
-        'description': '',
-        'dialogueCount': 0,
-        'sampleDialogues': [],
-        'scenes': set(),
-        'interactions': set()
-    })
-    
-    current_character = None
-    in_dialogue = False
-    scene_count = 0
-    
-    # Split script into lines
-    lines = script_text.split('\n')
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Skip empty lines
-        if not line:
+from keyword_matcher import build_keyword_matcher, keywords_in
+from result_cache import cached_analysis
+from screenplay_parser import ACTION, CHARACTER, DIALOGUE, is_preamble, iter_scenes
+
+ANALYZER_VERSION = 2
+
+EIGENVECTOR_ITERATIONS = 100
+
+def init_character_analysis() -> Dict:
+    return {
+        'characters': defaultdict(lambda: {
+            'name': '',
+            'role': 'Supporting Character',  # Default role
+            'description': '',
+            'dialogueCount': 0,
+            'sampleDialogues': [],
+            'scenes': [],
+            'interactions': []
+        }),
+        # Scene x character incidence: one bitset of scene numbers per speaking character
+        'scene_bits': defaultdict(int),
+        'in_dialogue': False,
+        # Characters given a description, and a matcher over every name seen (None until the next
+        # action line after a new name appears, so it is compiled once per new name at most)
+        'described': set(),
+        'name_matcher': None
+    }
+
+def add_character_scene(state: Dict, scene: Dict):
+    """Fold one scene's elements into the running character analysis"""
+    characters = state['characters']
+
+    for element in scene['elements']:
+        element_type = element['type']
+
+        # Count each speech once per cue.  Cues come from the shared tokenizer: an extension such as
+        # (O.S.) or (CONT'D) is stripped so the speech counts towards the bare name, and a
+        # parenthetical line such as (CLOSE UP) is never a cue
+        if element_type == CHARACTER:
+            current_character = element['name']
+            state['in_dialogue'] = True
+
+            if current_character not in characters:
+                characters[current_character]['name'] = current_character
+                state['name_matcher'] = None
+
+            characters[current_character]['dialogueCount'] += 1
+
+            if not is_preamble(scene):
+                state['scene_bits'][current_character] |= 1 << scene['scene_number']
+                scenes = characters[current_character]['scenes']
+                if not scenes or scenes[-1] != scene['scene_number']:
+                    scenes.append(scene['scene_number'])
             continue
-            
-        # Detect scene headings
-        if line.startswith(('INT.', 'EXT.')):
-            scene_count += 1
+
+        # Capture the first line of each speech as a sample
+        if element_type == DIALOGUE:
+            samples = characters[element['character']]['sampleDialogues']
+            if state['in_dialogue'] and len(samples) < 3:
+                samples.append(element['text'])
+            state['in_dialogue'] = False
             continue
-            
-        # Detect character names (in all caps, not scene headings)
-        if line.isupper() and not line.startswith(('INT.', 'EXT.')):
-            # Check if it's a character name (not scene description or transition)
-            next_line = lines[i + 1].strip() if i + 1 < len(lines) else ''
-            if next_line and not next_line.isupper() and not next_line.startswith('('):
-                current_character = line
-                in_dialogue = True
-                
-                if current_character not in characters:
-                    characters[current_character]['name'] = current_character
-                
-                characters[current_character]['dialogueCount'] += 1
-                continue
-        
-        # Capture dialogue
-        if in_dialogue and current_character and line:
-            if not line.startswith('('):  # Skip parentheticals
-                if len(characters[current_character]['sampleDialogues']) < 3:
-                    characters[current_character]['sampleDialogues'].append(line)
-            in_dialogue = False
+
+        if element_type != ACTION or len(state['described']) == len(characters):
             continue
-            
+
         # Try to capture character descriptions
-        if not in_dialogue and any(char in line.upper() for char in characters.keys()):
-            for char in characters.keys():
-                if char in line.upper():
-                    if not characters[char]['description']:
-                        characters[char]['description'] = line
-    
+        if state['name_matcher'] is None:
+            state['name_matcher'] = build_keyword_matcher(characters)
+
+        described = keywords_in(element['text'].upper(), state['name_matcher']) - state['described']
+        for char in described:
+            characters[char]['description'] = element['text']
+        state['described'] |= described
+
+@cached_analysis('characters', ANALYZER_VERSION)
+def analyze_characters(script):
+    """Analyze characters from screenplay text, its tokenized form or an open script file"""
+    state = init_character_analysis()
+    for scene in iter_scenes(script):
+        add_character_scene(state, scene)
+    return finish_character_analysis(state)
+
+def popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+def co_occurrence_edges(scene_bits: Dict[str, int]) -> List[Tuple[str, str, int]]:
+    """(a, b, shared scene count) for every pair of characters who speak in a common scene.
+
+    Each pair costs one AND and popcount over the scene bitsets, so even a
+    200-character cast over thousands of scenes stays cheap.
+    """
+    names = [name for name, bits in scene_bits.items() if bits]
+    edges = []
+    for i, a in enumerate(names):
+        bits_a = scene_bits[a]
+        for b in names[i + 1:]:
+            shared = bits_a & scene_bits[b]
+            if shared:
+                edges.append((a, b, popcount(shared)))
+    return edges
+
+def eigenvector_centrality(names: List[str], edges: List[Tuple[str, str, int]]) -> Dict[str, float]:
+    """Weighted eigenvector centrality by power iteration, scaled so the most central character is 1"""
+    neighbours = {name: [] for name in names}
+    for a, b, weight in edges:
+        neighbours[a].append((b, weight))
+        neighbours[b].append((a, weight))
+
+    scores = dict.fromkeys(names, 1.0)
+    for _ in range(EIGENVECTOR_ITERATIONS):
+        # Adding the node's own score (A + I) keeps the iteration from oscillating
+        updated = {name: scores[name] + sum(scores[other] * weight for other, weight in neighbours[name])
+                   for name in names}
+        peak = max(updated.values(), default=0) or 1.0
+        updated = {name: score / peak for name, score in updated.items()}
+        converged = all(abs(updated[name] - scores[name]) < 1e-9 for name in names)
+        scores = updated
+        if converged:
+            break
+    return scores
+
+def add_interaction_graph(state: Dict):
+    """Fill in each character's scene partners and centrality from the incidence bitsets"""
+    characters = state['characters']
+    names = list(characters)
+    edges = co_occurrence_edges(state['scene_bits'])
+
+    strength = dict.fromkeys(names, 0)
+    for a, b, weight in edges:
+        characters[a]['interactions'].append({'name': b, 'sharedScenes': weight})
+        characters[b]['interactions'].append({'name': a, 'sharedScenes': weight})
+        strength[a] += weight
+        strength[b] += weight
+
+    eigenvector = eigenvector_centrality(names, edges)
+    others = max(len(names) - 1, 1)
+    for name, data in characters.items():
+        data['interactions'].sort(key=lambda x: (-x['sharedScenes'], x['name']))
+        data['centrality'] = {
+            'degree': round(len(data['interactions']) / others, 4),
+            'weighted': strength[name],
+            'eigenvector': round(eigenvector[name], 4)
+        }
+
+def finish_character_analysis(state: Dict) -> List[Dict]:
+    characters = state['characters']
+    add_interaction_graph(state)
+
     # Determine main characters (those with most dialogue)
     dialogue_counts = [(char, data['dialogueCount']) for char, data in characters.items()]
     dialogue_counts.sort(key=lambda x: x[1], reverse=True)
@@ -74,12 +164,9 @@ def analyze_characters(script_text):
         else:
             characters[char]['role'] = 'Main Character'
     
-    # Convert to list and clean up
+    # Convert to list
     character_list = []
     for char_data in characters.values():
-        # Remove set() for JSON serialization
-        char_data.pop('scenes')
-        char_data.pop('interactions')
         # Add default description if none found
         if not char_data['description']:
             char_data['description'] = f"Character appearing in the screenplay with {char_data['dialogueCount']} lines of dialogue."
@@ -97,12 +184,9 @@ def main():
     args = parser.parse_args()
     
     try:
-        # Read script
+        # Stream the script so large files are never held in memory whole
         with open(args.script, 'r') as f:
-            script_content = f.read()
-        
-        # Analyze characters
-        characters = analyze_characters(script_content)
+            characters = analyze_characters(f)
         
         # Output JSON to stdout
         print(json.dumps(characters))
@@ -1,48 +1,159 @@
 import torch
-from diffusers import StableDiffusionControlNetPipeline, ControlNetModel, UniPCMultistepScheduler
+from diffusers import UniPCMultistepScheduler
 from controlnet_aux import CannyDetector, OpenposeDetector
 from diffusers.utils import load_image
 import numpy as np
 import cv2
 from PIL import Image, ImageDraw
+import fcntl
+import hashlib
+import io
 import os
 import json
+import shutil
+import tempfile
+from collections import Counter
+
+from inference_profile import StepTimer, apply_cpu_profile, cpu_profile, inference_context
+from model_registry import DEFAULT_MODEL_ID, registry
+from prompt_embeddings import embedding_cache
+from result_cache import DEFAULT_CACHE_DIR
+
+CANNY_CONTROLNET = "lllyasviel/sd-controlnet-canny"
+POSE_CONTROLNET = "lllyasviel/sd-controlnet-openpose"
+
+# Part of every control image key; bump when the guides or detector settings change
+CONTROL_GUIDE_VERSION = 1
+
+# Panels reference their control images in this subdirectory of the storyboard
+CONTROLS_DIR = 'controls'
+
+def composition_layout(num_characters):
+    """The composition guide only distinguishes one, two or a group of characters"""
+    return num_characters if num_characters in (1, 2) else 'group'
+
+class ControlImageCache:
+    """Processed control images (canny, pose) keyed by what the guides are drawn from.
+
+    The guides depend only on the character count and the image size, so a
+    storyboard needs a handful of detector runs rather than one per panel.
+    Images live in memory and as content-addressed PNGs (named by the hash
+    of their bytes) in ``cache_dir``, with an index from key to hash, so they
+    survive across runs.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.getenv('CONTROL_CACHE_DIR', os.path.join(DEFAULT_CACHE_DIR, 'control_images'))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        self.index = self.read_index()
+        self.memory = {}
+        self.counters = Counter()
+
+    def path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.png")
+
+    def get(self, key, compute):
+        """(image, content hash) for a key, running ``compute`` only when neither tier has it"""
+        if key in self.memory:
+            self.counters['memory_hits'] += 1
+            return self.memory[key]
+
+        digest = self.index.get(key)
+        if digest and os.path.exists(self.path(digest)):
+            image = Image.open(self.path(digest))
+            image.load()
+            self.counters['disk_hits'] += 1
+        else:
+            image = compute()
+            digest = self.store(image)
+            self.index[key] = digest
+            self.save_index()
+            self.counters['computed'] += 1
+
+        self.memory[key] = (image, digest)
+        return self.memory[key]
+
+    def read_index(self):
+        """Key -> digest map on disk; a missing or unreadable index just means recomputing guides"""
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def write_atomic(self, path, data):
+        # Renders on one machine share the cache dir, so every writer gets its own temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def store(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.path(digest)):
+            self.write_atomic(self.path(digest), data)
+        return digest
+
+    def save_index(self):
+        """Merge into the index on disk so entries added by other processes are kept"""
+        with open(self.index_path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.index = dict(self.read_index(), **self.index)
+            self.write_atomic(self.index_path, json.dumps(self.index, indent=2).encode('utf-8'))
+
+    def materialize(self, digest, storyboard_dir):
+        """Path, relative to the storyboard, of one shared copy of a control image"""
+        relative = os.path.join(CONTROLS_DIR, f"{digest}.png")
+        target = os.path.join(storyboard_dir, relative)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(self.path(digest), target)
+            except OSError:
+                shutil.copyfile(self.path(digest), target)
+        return relative
 
 class StoryboardImageGenerator:
-    def __init__(self):
+    def __init__(self, control_cache=None, profile=None):
+        # Processed control images shared by every panel with the same layout
+        self.control_cache = control_cache or ControlImageCache()
+        
         # Initialize the canny edge detector
         self.canny = CannyDetector()
         
         # Initialize the pose detector
         self.pose = OpenposeDetector()
         
-        # Load ControlNet models
-        self.controlnet_canny = ControlNetModel.from_pretrained(
-            "lllyasviel/sd-controlnet-canny",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-        )
-        
-        self.controlnet_pose = ControlNetModel.from_pretrained(
-            "lllyasviel/sd-controlnet-openpose",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-        )
-        
-        # Initialize the pipeline
-        self.pipe = StableDiffusionControlNetPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            controlnet=[self.controlnet_canny, self.controlnet_pose],
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-        )
-        
-        # Use more efficient attention
-        self.pipe.enable_xformers_memory_efficient_attention()
+        # ControlNet models and the Stable Diffusion components come from the shared
+        # model registry, so image_generator in the same process reuses them
+        # (int8 renders get their own quantized copies)
+        use_cuda = torch.cuda.is_available()
+        if not use_cuda:
+            profile = profile or cpu_profile()
+        quantize = 'none' if use_cuda else profile['quantize']
+        self.controlnet_canny = registry.controlnet(CANNY_CONTROLNET, quantize=quantize)
+        self.controlnet_pose = registry.controlnet(POSE_CONTROLNET, quantize=quantize)
+        self.pipe = registry.controlnet_pipeline([CANNY_CONTROLNET, POSE_CONTROLNET], DEFAULT_MODEL_ID,
+                                                 quantize=quantize)
         
         # Use better scheduler
         self.pipe.scheduler = UniPCMultistepScheduler.from_config(self.pipe.scheduler.config)
         
-        # Move to GPU if available
-        if torch.cuda.is_available():
+        # Move to GPU if available; xformers attention only exists there
+        if use_cuda:
             self.pipe = self.pipe.to("cuda")
+            self.pipe.enable_xformers_memory_efficient_attention()
+        else:
+            apply_cpu_profile(self.pipe, profile)
     
     def create_composition_guide(self, scene_metadata, width=512, height=512):
         """Create a basic composition guide image based on scene description"""
@@ -103,15 +214,29 @@ class StoryboardImageGenerator:
         image_np = np.array(image)
         return image_np
     
-    def generate_image(self, scene_metadata, output_path):
-        """Generate an image for a scene using ControlNet"""
-        # Create control images
-        composition_guide = self.create_composition_guide(scene_metadata)
-        pose_guide = self.create_pose_guide(scene_metadata)
+    def control_images(self, scene_metadata, width=512, height=512):
+        """Canny and pose control images for a scene and their content hashes, from the cache when possible"""
+        num_characters = len(scene_metadata.get('characters', []))
+        size = f"{width}x{height}"
         
-        # Process control images
-        canny_image = self.canny(composition_guide)
-        pose_image = self.pose(pose_guide)
+        canny_image, canny_digest = self.control_cache.get(
+            f"canny:v{CONTROL_GUIDE_VERSION}:{composition_layout(num_characters)}:{size}",
+            lambda: self.canny(self.create_composition_guide(scene_metadata, width, height))
+        )
+        pose_image, pose_digest = self.control_cache.get(
+            f"pose:v{CONTROL_GUIDE_VERSION}:{num_characters}:{size}",
+            lambda: self.pose(self.create_pose_guide(scene_metadata, width, height))
+        )
+        return (canny_image, canny_digest), (pose_image, pose_digest)
+    
+    def generate_image(self, scene_metadata, output_path):
+        """Generate an image for a scene using ControlNet.
+
+        Instead of saving its own copies of the control images, the panel
+        gets references to shared ones in ``scene_metadata['control_images']``.
+        """
+        # Create and process control images
+        (canny_image, canny_digest), (pose_image, pose_digest) = self.control_images(scene_metadata)
         
         # Construct the prompt
         location = scene_metadata.get('location', '')
@@ -133,21 +258,28 @@ class StoryboardImageGenerator:
         prompt += " Cinematic, high quality, detailed, film still, professional lighting"
         
         # Generate the image
-        image = self.pipe(
-            prompt,
-            image=[canny_image, pose_image],
-            num_inference_steps=30,
-            guidance_scale=7.5,
-            controlnet_conditioning_scale=[0.5, 0.5]
-        ).images[0]
+        timer = StepTimer()
+        with inference_context(self.pipe):
+            image = self.pipe(
+                **embedding_cache.pipeline_inputs(self.pipe, [prompt]),
+                image=[canny_image, pose_image],
+                num_inference_steps=30,
+                guidance_scale=7.5,
+                controlnet_conditioning_scale=[0.5, 0.5],
+                callback_on_step_end=timer
+            ).images[0]
+        timer.report(os.path.basename(output_path))
         
         # Save the image
         image.save(output_path)
         
-        # Save the control images and prompt for reference
+        # Reference the shared control images and save the prompt
+        storyboard_dir = os.path.dirname(os.path.abspath(output_path))
+        scene_metadata['control_images'] = {
+            'canny': self.control_cache.materialize(canny_digest, storyboard_dir),
+            'pose': self.control_cache.materialize(pose_digest, storyboard_dir)
+        }
         base_path = output_path.rsplit('.', 1)[0]
-        canny_image.save(f"{base_path}_canny.png")
-        pose_image.save(f"{base_path}_pose.png")
         with open(f"{base_path}_prompt.txt", 'w') as f:
             f.write(prompt)
         
@@ -183,8 +315,18 @@ def generate_storyboard_images(metadata_dir):
                 prompt = generator.generate_image(scene_metadata, image_path)
                 print(f"Generated image for scene {scene_metadata.get('scene_number', '?')}")
                 print(f"Prompt used: {prompt}")
+                
+                # Record the control image references next to the scene
+                with open(metadata_path, 'w') as f:
+                    json.dump(scene_metadata, f, indent=2)
             except Exception as e:
                 print(f"Error generating image for {filename}: {str(e)}")
+    
+    counters = generator.control_cache.counters
+    print(f"Control images: {counters['computed']} computed, "
+          f"{counters['memory_hits'] + counters['disk_hits']} reused")
+    embeddings = embedding_cache.stats()
+    print(f"Prompt embeddings: {embeddings['misses']} encoded, {embeddings['hits']} reused")
 
 if __name__ == '__main__':
     import sys
@@ -1,21 +1,55 @@
 import torch
-from diffusers import StableDiffusionPipeline
 import os
+import sys
+import threading
+import time
+import zlib
 from PIL import Image
 import json
 
-def generate_image_from_scene(scene_metadata, output_path):
-    """Generate an image for a scene using Stable Diffusion"""
-    # Initialize the pipeline
-    model_id = "runwayml/stable-diffusion-v1-5"
-    pipe = StableDiffusionPipeline.from_pretrained(
-        model_id,
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-    )
-    
+from inference_profile import StepTimer, apply_cpu_profile, cpu_profile, inference_context
+from model_registry import DEFAULT_MODEL_ID, registry
+from prompt_embeddings import embedding_cache
+
+MODEL_ID = DEFAULT_MODEL_ID
+
+# Panel seeds are derived from this and the panel's file name (IMAGE_SEED)
+BASE_SEED = int(os.getenv('IMAGE_SEED', '0'))
+
+# Rough working memory of one 512x512 panel in float32 (both guidance passes);
+# batches are sized so they fit in what is free, keeping some headroom
+PANEL_MEMORY_MB = 1536
+MEMORY_HEADROOM = 0.25
+MAX_BATCH_SIZE = 8
+
+# Loaded pipelines by model id; loading takes longer than rendering a panel, so it happens once per process
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+def load_pipeline(model_id=MODEL_ID, profile=None):
+    """Load a Stable Diffusion pipeline onto the best available device (``profile`` overrides the CPU profile).
+
+    The components come from the shared model registry, so a ControlNet
+    pipeline in the same process reuses them.  Each quantize mode gets its
+    own copy, so float and int8 pipelines can be loaded side by side.
+    """
     if torch.cuda.is_available():
-        pipe = pipe.to("cuda")
+        return registry.stable_diffusion(model_id).to("cuda")
     
+    profile = profile or cpu_profile()
+    pipe = registry.stable_diffusion(model_id, quantize=profile['quantize'])
+    apply_cpu_profile(pipe, profile)
+    return pipe
+
+def get_pipeline(model_id=MODEL_ID):
+    """Process-wide pipeline for a model, loaded on first use and kept resident"""
+    with _pipelines_lock:
+        if model_id not in _pipelines:
+            _pipelines[model_id] = load_pipeline(model_id)
+        return _pipelines[model_id]
+
+def scene_prompt(scene_metadata):
+    """Text prompt for a scene built from its storyboard metadata"""
     # Construct the prompt based on scene metadata
     location = scene_metadata.get('location', '')
     time_of_day = scene_metadata.get('time_of_day', '')
@@ -35,14 +69,17 @@ def generate_image_from_scene(scene_metadata, output_path):
     
     # Add cinematographic quality keywords
     prompt += " Cinematic, high quality, detailed, film still"
-    
-    # Generate the image
-    image = pipe(
-        prompt,
-        num_inference_steps=50,
-        guidance_scale=7.5
-    ).images[0]
-    
+    return prompt
+
+def panel_seed(output_path):
+    """Seed for one panel, derived from its file name so it does not depend on batching or order"""
+    name = os.path.splitext(os.path.basename(output_path))[0]
+    return zlib.crc32(f"{BASE_SEED}:{name}".encode('utf-8'))
+
+def panel_generator(pipe, output_path):
+    return torch.Generator(device=pipe.device).manual_seed(panel_seed(output_path))
+
+def save_panel(image, prompt, output_path):
     # Save the image
     image.save(output_path)
     
@@ -50,15 +87,75 @@ def generate_image_from_scene(scene_metadata, output_path):
     prompt_path = output_path.rsplit('.', 1)[0] + '_prompt.txt'
     with open(prompt_path, 'w') as f:
         f.write(prompt)
+
+def generate_image_from_scene(scene_metadata, output_path, pipe=None):
+    """Generate an image for a scene using Stable Diffusion (the shared pipeline unless one is given)"""
+    if pipe is None:
+        pipe = get_pipeline()
+    prompt = scene_prompt(scene_metadata)
+    
+    # Generate the image
+    timer = StepTimer()
+    with inference_context(pipe):
+        image = pipe(
+            **embedding_cache.pipeline_inputs(pipe, [prompt]),
+            num_inference_steps=50,
+            guidance_scale=7.5,
+            generator=panel_generator(pipe, output_path),
+            callback_on_step_end=timer
+        ).images[0]
+    timer.report(os.path.basename(output_path))
     
+    save_panel(image, prompt, output_path)
     return prompt
 
-def generate_storyboard_images(metadata_dir):
-    """Generate images for all scenes in the storyboard"""
-    # Create output directory if it doesn't exist
-    os.makedirs(metadata_dir, exist_ok=True)
+def generate_image_batch(panels, pipe):
+    """Render several (scene_metadata, output_path) panels with one pipeline call.
+
+    Each panel keeps its own seeded generator, so it comes out the same as
+    when rendered alone.
+    """
+    prompts = [scene_prompt(scene_metadata) for scene_metadata, _ in panels]
+    timer = StepTimer()
+    with inference_context(pipe):
+        images = pipe(
+            **embedding_cache.pipeline_inputs(pipe, prompts),
+            num_inference_steps=50,
+            guidance_scale=7.5,
+            generator=[panel_generator(pipe, output_path) for _, output_path in panels],
+            callback_on_step_end=timer
+        ).images
+    timer.report(f"Batch of {len(panels)}")
     
-    # Process each metadata file
+    for image, prompt, (_, output_path) in zip(images, prompts, panels):
+        save_panel(image, prompt, output_path)
+    return prompts
+
+def available_memory_mb(pipe):
+    """Free memory on the device the pipeline runs on"""
+    if pipe.device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(pipe.device)
+        return free / (1024 * 1024)
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def auto_batch_size(pipe):
+    """Largest batch whose activations fit in the memory left after loading the model"""
+    if os.getenv('IMAGE_BATCH_SIZE'):
+        return max(1, int(os.getenv('IMAGE_BATCH_SIZE')))
+    per_panel = PANEL_MEMORY_MB / 2 if pipe.dtype == torch.float16 else PANEL_MEMORY_MB
+    usable = available_memory_mb(pipe) * (1 - MEMORY_HEADROOM)
+    return int(max(1, min(MAX_BATCH_SIZE, usable // per_panel)))
+
+def pending_panels(metadata_dir):
+    """(scene_metadata, image_path) for every scene that has no image yet"""
+    panels = []
     for filename in sorted(os.listdir(metadata_dir)):
         if filename.endswith('_metadata.json'):
             metadata_path = os.path.join(metadata_dir, filename)
@@ -73,20 +170,86 @@ def generate_storyboard_images(metadata_dir):
             
             # Load metadata
             with open(metadata_path, 'r') as f:
-                scene_metadata = json.load(f)
-            
+                panels.append((json.load(f), image_path))
+    return panels
+
+def generate_storyboard_images(metadata_dir, pipe=None, log=print, batch_size=None):
+    """Generate images for all scenes in the storyboard, returning how many were generated and failed.
+
+    Pending scenes are rendered ``batch_size`` prompts per pipeline call;
+    by default the size follows the memory available (IMAGE_BATCH_SIZE
+    overrides it).  A batch that fails is retried one panel at a time.
+    """
+    generated = 0
+    failed = 0
+    
+    # Create output directory if it doesn't exist
+    os.makedirs(metadata_dir, exist_ok=True)
+    panels = pending_panels(metadata_dir)
+    if not panels:
+        return {'generated': 0, 'failed': 0, 'batch_size': 0}
+    
+    # Only load the model once there is something to render
+    if pipe is None:
+        pipe = get_pipeline()
+    if batch_size is None:
+        batch_size = auto_batch_size(pipe)
+    
+    for start in range(0, len(panels), batch_size):
+        batch = panels[start:start + batch_size]
+        try:
+            prompts = generate_image_batch(batch, pipe) if len(batch) > 1 else None
+        except Exception as e:
+            log(f"Batch of {len(batch)} failed, rendering one at a time: {str(e)}")
+            prompts = None
+        
+        for i, (scene_metadata, image_path) in enumerate(batch):
             try:
                 # Generate image
-                prompt = generate_image_from_scene(scene_metadata, image_path)
-                print(f"Generated image for scene {scene_metadata.get('scene_number', '?')}")
-                print(f"Prompt used: {prompt}")
+                prompt = prompts[i] if prompts else generate_image_from_scene(scene_metadata, image_path, pipe)
+                generated += 1
+                log(f"Generated image for scene {scene_metadata.get('scene_number', '?')}")
+                log(f"Prompt used: {prompt}")
             except Exception as e:
-                print(f"Error generating image for {filename}: {str(e)}")
+                failed += 1
+                log(f"Error generating image for {os.path.basename(image_path)}: {str(e)}")
+    
+    return {'generated': generated, 'failed': failed, 'batch_size': batch_size}
+
+def log_to_stderr(message):
+    print(message, file=sys.stderr, flush=True)
+
+def serve(stream):
+    """Keep the pipeline resident and render each metadata directory read from ``stream``.
+
+    One directory per line; each gets one JSON line back on stdout with its
+    counts, while the per-panel log goes to stderr.
+    """
+    start = time.perf_counter()
+    pipe = get_pipeline()
+    print(json.dumps({'status': 'ready', 'load_seconds': round(time.perf_counter() - start, 2),
+                      'models': registry.report()}), flush=True)
+    
+    for line in stream:
+        metadata_dir = line.strip()
+        if not metadata_dir:
+            continue
+        start = time.perf_counter()
+        try:
+            summary = generate_storyboard_images(metadata_dir, pipe, log=log_to_stderr)
+            summary.update(status='complete', seconds=round(time.perf_counter() - start, 2),
+                           prompt_embeddings=embedding_cache.stats())
+        except Exception as e:
+            summary = {'status': 'error', 'message': str(e)}
+        print(json.dumps(dict(summary, metadata_dir=metadata_dir)), flush=True)
 
 if __name__ == '__main__':
-    import sys
+    if len(sys.argv) == 2 and sys.argv[1] == '--serve':
+        serve(sys.stdin)
+        sys.exit(0)
     if len(sys.argv) != 2:
         print("Usage: python image_generator.py <metadata_directory>")
+        print("       python image_generator.py --serve   (metadata directories on stdin, one per line)")
         sys.exit(1)
     
     generate_storyboard_images(sys.argv[1])
@@ -0,0 +1,171 @@
+import contextlib
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+import torch
+
+# Renders expected to share one machine; each gets an equal slice of the cores (RENDER_WORKERS)
+DEFAULT_RENDER_WORKERS = 1
+DEFAULT_INTEROP_THREADS = 1
+
+# CPU flags that mean bfloat16 matmuls run natively instead of being emulated
+BF16_CPU_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+# Pipeline components whose Linear layers the int8 mode quantizes
+QUANTIZED_COMPONENTS = ('text_encoder', 'unet', 'controlnet')
+QUANTIZE_MODES = ('none', 'int8')
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def env_flag(name: str) -> Optional[bool]:
+    """True/False for an explicit setting, None for unset or 'auto'"""
+    value = os.getenv(name, 'auto').lower()
+    if value in ('1', 'true', 'on'):
+        return True
+    if value in ('0', 'false', 'off'):
+        return False
+    return None
+
+
+def cpu_supports_bf16() -> bool:
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = next((line for line in f if line.startswith('flags')), '').split()
+    except OSError:
+        return False
+    return any(flag in flags for flag in BF16_CPU_FLAGS)
+
+
+def cpu_profile() -> Dict:
+    """CPU render settings from the environment, defaulting to an even share of the machine.
+
+    IMAGE_THREADS / IMAGE_INTEROP_THREADS set the thread pools outright;
+    otherwise the cores are split across RENDER_WORKERS renders.
+    IMAGE_BF16 and IMAGE_CHANNELS_LAST are on, off or auto.
+    IMAGE_QUANTIZE=int8 turns on dynamic int8 quantization, which runs in
+    float32 between the int8 matmuls and so replaces bfloat16 autocast.
+    """
+    quantize = os.getenv('IMAGE_QUANTIZE', 'none').lower()
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown IMAGE_QUANTIZE mode: {quantize} (expected one of: {', '.join(QUANTIZE_MODES)})")
+
+    workers = max(1, int(os.getenv('RENDER_WORKERS', DEFAULT_RENDER_WORKERS)))
+    threads = int(os.getenv('IMAGE_THREADS', 0)) or max(1, (os.cpu_count() or 1) // workers)
+    bf16 = env_flag('IMAGE_BF16')
+    channels_last = env_flag('IMAGE_CHANNELS_LAST')
+    return {
+        'threads': threads,
+        'interop_threads': int(os.getenv('IMAGE_INTEROP_THREADS', DEFAULT_INTEROP_THREADS)),
+        'bf16': quantize == 'none' and (cpu_supports_bf16() if bf16 is None else bf16),
+        'channels_last': True if channels_last is None else channels_last,
+        'attention_slicing': True,
+        'quantize': quantize
+    }
+
+
+def apply_cpu_profile(pipe, profile: Optional[Dict] = None) -> Dict:
+    """Tune a diffusers pipeline for CPU inference and record the profile on it"""
+    profile = dict(profile or cpu_profile())
+    if profile['quantize'] == 'none':
+        quantized = [name for name in QUANTIZED_COMPONENTS if getattr(getattr(pipe, name, None), 'int8_quantized', False)]
+        if quantized:
+            raise ValueError(f"Pipeline components already int8-quantized ({', '.join(quantized)}); "
+                             "load a separate copy for quantize='none'")
+    torch.set_num_threads(profile['threads'])
+    try:
+        torch.set_num_interop_threads(profile['interop_threads'])
+    except RuntimeError:
+        # Only possible before the first parallel op in the process; keep whatever is in place
+        profile['interop_threads'] = torch.get_num_interop_threads()
+
+    if profile['channels_last']:
+        for name in ('unet', 'vae', 'controlnet'):
+            module = getattr(pipe, name, None)
+            # A list of ControlNets is wrapped in a MultiControlNetModel, which is a module too
+            if isinstance(module, torch.nn.Module):
+                module.to(memory_format=torch.channels_last)
+
+    if profile['attention_slicing']:
+        pipe.enable_attention_slicing()
+
+    if profile['quantize'] == 'int8':
+        profile['quantized'] = quantize_pipeline(pipe)
+
+    pipe.cpu_profile = profile
+    log(f"CPU inference profile: {profile}")
+    return profile
+
+
+def weight_bytes(module) -> int:
+    """Bytes held by a module's weights, counting the packed weights of quantized layers"""
+    total = 0
+    for value in module.state_dict().values():
+        tensors = value if isinstance(value, (tuple, list)) else (value,)
+        total += sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor))
+    return total
+
+
+def quantize_pipeline(pipe) -> Dict:
+    """Dynamic int8 quantization of the Linear layers in the text encoder, UNet and ControlNets.
+
+    Weights are stored as int8 and activations are quantized on the fly, so
+    there is no calibration step.  Convolutions stay in float32.  Returns
+    the weight memory of each component before and after, in MB.
+    """
+    report = {}
+    for name in QUANTIZED_COMPONENTS:
+        module = getattr(pipe, name, None)
+        # Components shared between pipelines may have been quantized through another one already
+        if not isinstance(module, torch.nn.Module) or getattr(module, 'int8_quantized', False):
+            continue
+        before = weight_bytes(module)
+        layers = sum(type(child) is torch.nn.Linear for child in module.modules())
+        torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        module.int8_quantized = True
+        report[name] = {
+            'linear_layers': layers,
+            'before_mb': round(before / 2 ** 20, 1),
+            'after_mb': round(weight_bytes(module) / 2 ** 20, 1)
+        }
+    return report
+
+
+def inference_context(pipe):
+    """bfloat16 autocast when the pipeline's CPU profile asks for it"""
+    profile = getattr(pipe, 'cpu_profile', None)
+    if profile and profile['bf16']:
+        return torch.autocast('cpu', dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+class StepTimer:
+    """``callback_on_step_end`` hook that measures seconds per denoising step.
+
+    Timing runs from the end of the first step to the end of the last, so
+    prompt encoding and VAE decoding are left out.
+    """
+
+    def __init__(self):
+        self.first = None
+        self.last = None
+        self.steps = 0
+
+    def __call__(self, pipe, step, timestep, callback_kwargs):
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.steps += 1
+        return callback_kwargs
+
+    @property
+    def seconds_per_step(self) -> float:
+        return (self.last - self.first) / (self.steps - 1) if self.steps > 1 else 0.0
+
+    def report(self, label: str):
+        log(f"{label}: {self.steps} steps, {self.seconds_per_step:.3f} s/step")
@@ -0,0 +1,56 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Pattern, Set, Tuple
+
+# Compiled pattern plus, for each keyword, the shorter keywords it starts with
+KeywordMatcher = Tuple[Pattern, Dict[str, List[str]]]
+
+
+def trie_pattern(node: Dict) -> str:
+    """Regex for the keywords below a trie node; longer keywords are tried before shorter ones"""
+    branches = [re.escape(char) + trie_pattern(child) for char, child in node.items() if char]
+    if not branches:
+        return ''
+
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        return ('(?:' + body + ')' if len(branches) == 1 else body) + '?'
+    return body
+
+
+def build_keyword_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """Compile keywords into one trie-shaped regex that reports every occurrence in a single scan.
+
+    The lookahead lets matches overlap, so a keyword inside another keyword
+    is still found at its own position.  Each match is the longest keyword
+    starting there; shorter keywords that are prefixes of it come from the
+    returned map.
+    """
+    keywords = set(keywords)
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    pattern = re.compile('(?=(' + trie_pattern(trie) + '))')
+    prefixes = {
+        keyword: [keyword[:i] for i in range(1, len(keyword)) if keyword[:i] in keywords]
+        for keyword in keywords
+    }
+    return pattern, prefixes
+
+
+def iter_keyword_hits(text: str, matcher: KeywordMatcher) -> Iterator[Tuple[str, int]]:
+    """Yield (keyword, offset) for every occurrence of every keyword, in text order"""
+    pattern, prefixes = matcher
+    for match in pattern.finditer(text):
+        keyword = match.group(1)
+        position = match.start()
+        yield keyword, position
+        for prefix in prefixes[keyword]:
+            yield prefix, position
+
+
+def keywords_in(text: str, matcher: KeywordMatcher) -> Set[str]:
+    return {keyword for keyword, _ in iter_keyword_hits(text, matcher)}
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from result_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_MAX_MB = 64
+DEFAULT_TTL_DAYS = 30
+
+# LLM_CACHE values: use the cache, skip it, or answer from it alone
+MODES = {
+    '1': 'on', 'on': 'on', 'true': 'on',
+    '0': 'off', 'off': 'off', 'false': 'off',
+    'only': 'only', 'cache-only': 'only'
+}
+
+
+class CacheMissError(Exception):
+    """Raised in cache-only mode for a prompt that has no cached response"""
+
+
+class ResponseCache:
+    """SQLite cache of chat completion responses keyed by everything that shapes the answer.
+
+    The key covers the model, every message (system and user prompt),
+    temperature and max_tokens, so any edit to a prompt is a miss.  Entries
+    expire ``ttl`` seconds after they were written; the table is bounded by
+    total response size and evicts the least recently used rows first.  In
+    cache-only mode (``offline``) a miss raises instead of reaching the API.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 ttl: float = DEFAULT_TTL_DAYS * 86400, offline: bool = False):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER, created REAL, accessed REAL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int]) -> str:
+        request = json.dumps([model, messages, temperature, max_tokens], sort_keys=True)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int]) -> Optional[str]:
+        """Cached response text, or None (raising CacheMissError instead when offline)"""
+        key = self.make_key(model, messages, temperature, max_tokens)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+                self.db.commit()
+                self.counters['hits'] += 1
+                return row[0]
+
+            if row:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.db.commit()
+                self.counters['expired'] += 1
+            self.counters['misses'] += 1
+
+        if self.offline:
+            raise CacheMissError(f'No cached response for this {model} prompt (cache-only mode)')
+        return None
+
+    def put(self, model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int], value: str):
+        key = self.make_key(model, messages, temperature, max_tokens)
+        now = time.time()
+
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses (key, model, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, model, value, len(value), now, now)
+            )
+            self.evict(now)
+            self.db.commit()
+
+    def discard(self, model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int]):
+        """Drop a cached response the caller could not use, so the next request asks the API again"""
+        key = self.make_key(model, messages, temperature, max_tokens)
+
+        with self.lock:
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.db.commit()
+            self.counters['discarded'] += 1
+
+    def evict(self, now: float):
+        """Drop expired rows, then least recently used rows until the table fits in max_bytes"""
+        self.db.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.db.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                'hits': self.counters['hits'],
+                'misses': self.counters['misses'],
+                'expired': self.counters['expired'],
+                'discarded': self.counters['discarded'],
+                'hit_rate': self.counters['hits'] / lookups if lookups else 0.0,
+                'offline': self.offline
+            }
+
+
+_cache = None
+_cache_configured = False
+
+
+def configure(mode: Optional[str] = None, path: Optional[str] = None, max_bytes: Optional[int] = None,
+              ttl: Optional[float] = None) -> Optional[ResponseCache]:
+    """Replace the process-wide response cache; settings default to the LLM_CACHE_* environment"""
+    global _cache, _cache_configured
+    _cache_configured = True
+
+    if mode is None:
+        mode = os.getenv('LLM_CACHE', 'on')
+    if MODES.get(mode.lower()) is None:
+        raise ValueError(f'Unknown LLM cache mode: {mode} (expected one of: {", ".join(MODES)})')
+    mode = MODES[mode.lower()]
+
+    if mode == 'off':
+        _cache = None
+        return None
+
+    if path is None:
+        cache_dir = os.getenv('LLM_CACHE_DIR', os.getenv('ANALYSIS_CACHE_DIR', DEFAULT_CACHE_DIR))
+        path = os.path.join(cache_dir, 'llm_responses.sqlite')
+    if max_bytes is None:
+        max_bytes = int(float(os.getenv('LLM_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    if ttl is None:
+        ttl = float(os.getenv('LLM_CACHE_TTL_DAYS', DEFAULT_TTL_DAYS)) * 86400
+
+    _cache = ResponseCache(path, max_bytes, ttl, offline=mode == 'only')
+    return _cache
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache, created on first use unless LLM_CACHE=0"""
+    if not _cache_configured:
+        configure()
+    return _cache
+
+
+def cache_stats() -> Dict:
+    cache = get_cache()
+    return cache.stats() if cache else {'enabled': False}
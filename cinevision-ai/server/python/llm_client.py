@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from llm_cache import ResponseCache
+
+DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 40000
+DEFAULT_MAX_RETRIES = 5
+
+# Rate limits and transient server errors are retried; anything else fails the call
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Rough prompt size for the token budget; close enough for rate limiting
+CHARS_PER_TOKEN = 4
+
+
+class LLMError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        # No status means the request never got an answer (timeout, refused connection)
+        return self.status is None or self.status in RETRY_STATUSES
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``per_minute``, holding at most a minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: Optional[int]) -> int:
+    prompt_chars = sum(len(message['content']) for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay-seconds form; HTTP dates fall back to our own backoff
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def env_number(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class ChatClient:
+    """Chat completions against an OpenAI-compatible endpoint with bounded concurrency.
+
+    Each request waits for a slot (``concurrency``), then for the
+    requests/min and tokens/min buckets, and is retried with full-jitter
+    exponential backoff (or the server's Retry-After) on 429s, 5xx and
+    connection failures.  HTTP runs on a small thread pool so the standard
+    library is enough and a local stub server can stand in for the API.
+    With a ``cache`` (llm_cache.ResponseCache) every request is looked up
+    there first and only misses count against the limits.  Create the
+    client inside the event loop that will use it.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, concurrency: Optional[int] = None,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, timeout: float = 60.0,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0, cache: Optional[ResponseCache] = None):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv('OPENAI_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.concurrency = int(concurrency or env_number('LLM_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cache = cache
+        # Requests that actually went out, retries included
+        self.network_calls = 0
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.request_bucket = TokenBucket(
+            requests_per_minute or env_number('LLM_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE)
+        )
+        self.token_bucket = TokenBucket(
+            tokens_per_minute or env_number('LLM_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def post(self, path: str, body: Dict) -> Dict:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.api_key}'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            retry_after = parse_retry_after(e.headers.get('Retry-After') if e.headers else None)
+            raise LLMError(f'HTTP {e.code}: {e.reason}', e.code, retry_after)
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise LLMError(f'Request failed: {e}')
+
+    def backoff(self, attempt: int, error: LLMError) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, error.retry_after or 0)
+
+    async def complete(self, messages: List[Dict], model: str, max_tokens: Optional[int] = None,
+                       temperature: float = 0.7) -> str:
+        """Content of the first choice of one chat completion"""
+        # The cache is SQLite on disk, so its reads and writes stay off the event loop
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, model, messages, temperature, max_tokens)
+            if cached is not None:
+                return cached
+
+        body = {'model': model, 'messages': messages, 'temperature': temperature}
+        if max_tokens:
+            body['max_tokens'] = max_tokens
+        tokens = estimate_tokens(messages, max_tokens)
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(tokens)
+                try:
+                    self.network_calls += 1
+                    response = await loop.run_in_executor(self.executor, self.post, '/chat/completions', body)
+                    content = response['choices'][0]['message']['content']
+                    break
+                except LLMError as e:
+                    if not e.retryable or attempt == self.max_retries:
+                        raise
+                    delay = self.backoff(attempt, e)
+            # Sleep outside the slot so other requests keep going meanwhile
+            await asyncio.sleep(delay)
+
+        # Written after leaving the slot so the next request is not held up by the disk
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, model, messages, temperature, max_tokens, content)
+        return content
+
+    async def forget(self, messages: List[Dict], model: str, max_tokens: Optional[int] = None,
+                     temperature: float = 0.7):
+        """Remove the cached response to a request whose content turned out to be unusable"""
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.discard, model, messages, temperature, max_tokens)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def start_completions(client: ChatClient, requests: List[Dict]) -> List[asyncio.Future]:
+    """Start every request at once; awaiting the futures in order yields results in request order"""
+    return [asyncio.ensure_future(client.complete(**request)) for request in requests]
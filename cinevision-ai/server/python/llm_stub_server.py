@@ -0,0 +1,140 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, latency: float, jitter: float, error_rate: float, rate_limit_rate: float,
+                 malformed_rate: float = 0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'malformed': 0}
+
+    def roll(self):
+        """Decide delay and outcome for one request"""
+        with self.lock:
+            self.counts['requests'] += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            outcome = self.random.random()
+            if outcome < self.rate_limit_rate:
+                self.counts['rate_limited'] += 1
+                return delay, 429
+            if outcome < self.rate_limit_rate + self.error_rate:
+                self.counts['errors'] += 1
+                return delay, 500
+            return delay, 200
+
+    def malformed(self) -> bool:
+        with self.lock:
+            if self.random.random() < self.malformed_rate:
+                self.counts['malformed'] += 1
+                return True
+            return False
+
+
+def stub_content(prompt: str, state: StubState) -> str:
+    """Batched prompts (several "Scene N:" lines) get a JSON array, anything else a line of text"""
+    numbers = re.findall(r'^Scene (\d+):', prompt, re.M)
+    if len(numbers) < 2:
+        return f'Stub frame for: {prompt[:80]}'
+
+    content = json.dumps([{'scene': int(number), 'description': f'Stub frame for scene {number}'}
+                          for number in numbers])
+    # A reply cut off mid-array, like one that ran out of max_tokens
+    return content[:len(content) // 2] if state.malformed() else content
+
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        """Answers /chat/completions like the OpenAI API, with injected latency and failures"""
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+
+            if not self.path.endswith('/chat/completions'):
+                return self.reply(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+            delay, status = state.roll()
+            time.sleep(delay)
+
+            if status == 429:
+                return self.reply(429, {'error': {'message': 'Rate limit reached'}}, {'Retry-After': '0.1'})
+            if status != 200:
+                return self.reply(status, {'error': {'message': 'Injected server error'}})
+
+            prompt = body.get('messages', [{}])[-1].get('content', '')
+            self.reply(200, {
+                'id': f'stub-{state.counts["requests"]}',
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': stub_content(prompt, state)},
+                    'finish_reason': 'stop'
+                }]
+            })
+
+        def do_GET(self):
+            # Counters, so a test can check how many calls and retries happened
+            self.reply(200, state.counts)
+
+        def reply(self, status: int, payload, headers=None):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def serve(port: int = 0, latency: float = 0.5, jitter: float = 0.1, error_rate: float = 0.0,
+          rate_limit_rate: float = 0.0, malformed_rate: float = 0.0, seed=None) -> ThreadingHTTPServer:
+    """Start the stub on a background thread; port 0 picks a free port (see server.server_address)"""
+    state = StubState(latency, jitter, error_rate, rate_limit_rate, malformed_rate, seed)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the chat completions API')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.5, help='Mean response time in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Latency varies by up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests answered with a 429')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of batched replies cut off mid-JSON')
+    parser.add_argument('--seed', type=int, help='Random seed for repeatable runs')
+
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate,
+                   args.malformed_rate, args.seed)
+    print(f'Stub listening on http://127.0.0.1:{server.server_address[1]}/v1', file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+from typing import Dict, List
+
+import torch
+from diffusers import ControlNetModel, StableDiffusionControlNetPipeline, StableDiffusionPipeline
+
+from inference_profile import weight_bytes
+
+DEFAULT_MODEL_ID = "runwayml/stable-diffusion-v1-5"
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def default_dtype():
+    return torch.float16 if torch.cuda.is_available() else torch.float32
+
+
+def from_pretrained(loader, model_id: str, **kwargs):
+    """Load weights from safetensors (memory-mapped, not read into a private copy) when the repo has them"""
+    try:
+        return loader.from_pretrained(model_id, use_safetensors=True, low_cpu_mem_usage=True, **kwargs)
+    except (OSError, ValueError):
+        return loader.from_pretrained(model_id, low_cpu_mem_usage=True, **kwargs)
+
+
+class ModelRegistry:
+    """Process-wide store of diffusion model components.
+
+    The Stable Diffusion components (VAE, text encoder, tokenizer, UNet,
+    safety checker) are loaded once per model and dtype and shared by every
+    pipeline built here, so a worker rendering both plain and ControlNet
+    panels holds one copy.  ControlNets are loaded once per repo.  Anything
+    done to a shared module in place (device moves) is seen by every
+    pipeline using it.  Quantization is done in place too, so the quantize
+    mode (see inference_profile.QUANTIZE_MODES) is part of every key: int8
+    pipelines get their own copies and float ones are never quantized
+    behind their back.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.base = {}
+        self.controlnets = {}
+        self.controlnet_pipelines = {}
+
+    def stable_diffusion(self, model_id: str = DEFAULT_MODEL_ID, dtype=None,
+                         quantize: str = 'none') -> StableDiffusionPipeline:
+        dtype = dtype or default_dtype()
+        key = (model_id, dtype, quantize)
+        with self.lock:
+            if key not in self.base:
+                self.base[key] = from_pretrained(StableDiffusionPipeline, model_id, torch_dtype=dtype)
+                log(f"Loaded {model_id} ({dtype}, {quantize}): {self.component_memory(self.base[key])}")
+            return self.base[key]
+
+    def controlnet(self, repo_id: str, dtype=None, quantize: str = 'none') -> ControlNetModel:
+        dtype = dtype or default_dtype()
+        key = (repo_id, dtype, quantize)
+        with self.lock:
+            if key not in self.controlnets:
+                self.controlnets[key] = from_pretrained(ControlNetModel, repo_id, torch_dtype=dtype)
+                log(f"Loaded {repo_id} ({dtype}, {quantize}): {module_mb(self.controlnets[key])} MB")
+            return self.controlnets[key]
+
+    def controlnet_pipeline(self, controlnet_ids: List[str], model_id: str = DEFAULT_MODEL_ID,
+                            dtype=None, quantize: str = 'none') -> StableDiffusionControlNetPipeline:
+        """ControlNet pipeline over the shared base components (replacing its scheduler leaves the base one alone)"""
+        dtype = dtype or default_dtype()
+        key = (model_id, tuple(controlnet_ids), dtype, quantize)
+        with self.lock:
+            if key not in self.controlnet_pipelines:
+                components = dict(self.stable_diffusion(model_id, dtype, quantize).components)
+                components['controlnet'] = [self.controlnet(repo_id, dtype, quantize) for repo_id in controlnet_ids]
+                self.controlnet_pipelines[key] = StableDiffusionControlNetPipeline(**components)
+            return self.controlnet_pipelines[key]
+
+    @staticmethod
+    def component_memory(pipe) -> Dict[str, float]:
+        return {name: module_mb(module) for name, module in pipe.components.items()
+                if isinstance(module, torch.nn.Module)}
+
+    def report(self) -> Dict:
+        """Weight memory of every loaded component in MB, plus the process resident set"""
+        with self.lock:
+            return {
+                'models': {f"{model_id} ({dtype}, {quantize})": self.component_memory(pipe)
+                           for (model_id, dtype, quantize), pipe in self.base.items()},
+                'controlnets': {f"{repo_id} ({dtype}, {quantize})": module_mb(module)
+                                for (repo_id, dtype, quantize), module in self.controlnets.items()},
+                'resident_mb': resident_mb()
+            }
+
+    def clear(self):
+        """Forget every loaded model (they are freed once no pipeline refers to them)"""
+        with self.lock:
+            self.base.clear()
+            self.controlnets.clear()
+            self.controlnet_pipelines.clear()
+
+
+def module_mb(module) -> float:
+    return round(weight_bytes(module) / 2 ** 20, 1)
+
+
+def resident_mb() -> float:
+    """Current resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+
+
+registry = ModelRegistry()
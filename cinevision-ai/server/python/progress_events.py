@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Bumped whenever the event shape changes; version 1 events carried the full scene list
+PROGRESS_VERSION = 2
+DEFAULT_MAX_RATE = 10.0
+
+
+class ProgressStream:
+    """Delta progress events for a long job, sent at most ``max_rate`` times a second.
+
+    Every event carries the counters plus only the scenes (and per-scene
+    errors) completed since the previous event, so the bytes written grow
+    linearly with the number of scenes.  Updates that arrive faster than the
+    rate are coalesced: counters and message are taken from the latest one,
+    scenes and errors are concatenated, and a timer sends whatever is still
+    pending once the interval is up.  ``finish`` and ``fail`` are sent
+    straight away after flushing.
+    """
+
+    def __init__(self, emit: Callable[[Dict], None], total: int = 0, max_rate: Optional[float] = None):
+        if max_rate is None:
+            max_rate = float(os.getenv('PROGRESS_MAX_RATE', DEFAULT_MAX_RATE))
+        self.emit = emit
+        self.total = total
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.completed = 0
+        self.failed = 0
+        self.current = 0
+        self.message = ''
+        self.scenes = []
+        self.errors = []
+        self.dirty = False
+        self.sent_at = 0.0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def event(self, status: str) -> Dict:
+        event = {
+            'version': PROGRESS_VERSION,
+            'status': status,
+            'message': self.message,
+            'current': self.current,
+            'total': self.total,
+            'completed': self.completed,
+            'failed': self.failed,
+            'progress': (self.current / self.total) * 100 if self.total else 100.0
+        }
+        if self.scenes:
+            event['scenes'] = self.scenes
+            self.scenes = []
+        if self.errors:
+            event['errors'] = self.errors
+            self.errors = []
+        return event
+
+    def send(self, status: str = 'processing'):
+        """Emit everything pending; call with the lock held"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.dirty = False
+        self.sent_at = time.monotonic()
+        self.emit(self.event(status))
+
+    def changed(self):
+        self.dirty = True
+        wait = self.sent_at + self.interval - time.monotonic()
+        if wait <= 0:
+            self.send()
+        elif self.timer is None:
+            self.timer = threading.Timer(wait, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self.timer = None
+            if self.dirty:
+                self.send()
+
+    def update(self, current: int, message: str):
+        with self.lock:
+            self.current = current
+            self.message = message
+            self.changed()
+
+    def scene(self, frame: Dict):
+        with self.lock:
+            self.completed += 1
+            self.scenes.append(frame)
+            self.changed()
+
+    def scene_failed(self, scene_number: int, message: str):
+        with self.lock:
+            self.failed += 1
+            self.errors.append({'scene_number': scene_number, 'message': message})
+            self.changed()
+
+    def finish(self, message: str):
+        with self.lock:
+            self.current = self.total
+            self.message = message
+            self.send('complete')
+
+    def fail(self, message: str):
+        with self.lock:
+            self.message = message
+            self.send('error')
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List
+
+import torch
+
+# One SD 1.5 embedding is 77 x 768 floats (about 240 KB in float32)
+DEFAULT_MAX_ITEMS = 256
+
+# Classifier-free guidance pairs every prompt with the embedding of the empty negative prompt
+NEGATIVE_PROMPT = ''
+
+
+class PromptEmbeddingCache:
+    """LRU cache of CLIP text embeddings keyed by text encoder and prompt text.
+
+    CLIP attends over the whole token sequence, so an embedding belongs to
+    the full prompt; shared prefixes and the common quality suffix are not
+    reusable on their own, but identical prompts (re-renders, panels at the
+    same location with the same description) and the empty negative prompt
+    are encoded once.  Pipelines sharing a text encoder through the model
+    registry share entries.
+    """
+
+    def __init__(self, max_items: int = DEFAULT_MAX_ITEMS):
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def encoder_key(pipe):
+        # The encoder's own name, since pipelines assembled from shared components have none
+        encoder = pipe.text_encoder
+        name = getattr(encoder.config, '_name_or_path', '')
+        return (name, str(encoder.dtype), str(pipe.device), getattr(encoder, 'int8_quantized', False))
+
+    def encode(self, pipe, prompt: str) -> torch.Tensor:
+        """Embedding of one prompt, shape (1, tokens, hidden)"""
+        key = (self.encoder_key(pipe), prompt)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return self.entries[key]
+
+        with torch.no_grad():
+            embeds, _ = pipe.encode_prompt(prompt, pipe.device, 1, False)
+
+        with self.lock:
+            self.counters['misses'] += 1
+            self.entries[key] = embeds
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+        return embeds
+
+    def pipeline_inputs(self, pipe, prompts: List[str]) -> Dict[str, torch.Tensor]:
+        """``prompt_embeds`` and ``negative_prompt_embeds`` to pass to a pipeline instead of prompt strings"""
+        negative = self.encode(pipe, NEGATIVE_PROMPT)
+        return {
+            'prompt_embeds': torch.cat([self.encode(pipe, prompt) for prompt in prompts]),
+            'negative_prompt_embeds': negative.expand(len(prompts), -1, -1)
+        }
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                'hits': self.counters['hits'],
+                'misses': self.counters['misses'],
+                'entries': len(self.entries),
+                'hit_rate': self.counters['hits'] / lookups if lookups else 0.0
+            }
+
+
+embedding_cache = PromptEmbeddingCache(int(os.getenv('PROMPT_EMBED_CACHE_ITEMS', DEFAULT_MAX_ITEMS)))
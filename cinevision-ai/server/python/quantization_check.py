@@ -0,0 +1,201 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from inference_profile import QUANTIZED_COMPONENTS, StepTimer, cpu_profile, weight_bytes
+from model_registry import resident_mb
+
+# Fixed prompts covering the usual storyboard subjects: interiors, exteriors, night, crowds
+DEFAULT_PROMPTS = [
+    "INT. DINER, NIGHT. A waitress pours coffee for a tired detective. Cinematic, high quality, detailed, film still",
+    "EXT. DESERT HIGHWAY, DAY. A red car speeds past a lone gas station. Cinematic, high quality, detailed, film still",
+    "INT. SPACESHIP BRIDGE, NIGHT. The crew stares at a flashing warning light. Cinematic, high quality, detailed, film still",
+    "EXT. CITY MARKET, DAY. Crowds push between fruit stalls in the rain. Cinematic, high quality, detailed, film still"
+]
+DEFAULT_STEPS = 20
+DEFAULT_SEED = 1234
+# Reported for identical images, whose PSNR is infinite (JSON has no Infinity); far above any real difference
+PSNR_CAP = 100.0
+
+# Characters in the scene the ControlNet guides are drawn for
+CONTROLNET_SCENE = {'characters': ['A', 'B']}
+
+
+def pipeline_weights_mb(pipe) -> Dict[str, float]:
+    return {
+        name: round(weight_bytes(getattr(pipe, name)) / 2 ** 20, 1)
+        for name in QUANTIZED_COMPONENTS
+        if isinstance(getattr(pipe, name, None), torch.nn.Module)
+    }
+
+
+def image_difference(a: np.ndarray, b: np.ndarray) -> Dict:
+    """Mean absolute difference (0-255 scale) and PSNR in dB between two images, capped at PSNR_CAP"""
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    mse = float(np.mean((a - b) ** 2))
+    return {
+        'mae': round(float(np.mean(np.abs(a - b))), 3),
+        'psnr': round(min(float(10 * np.log10(255 ** 2 / mse)), PSNR_CAP), 2) if mse else PSNR_CAP
+    }
+
+
+def load_sd(profile: Dict):
+    from image_generator import MODEL_ID, load_pipeline
+    return load_pipeline(MODEL_ID, profile), {}
+
+
+def load_controlnet(profile: Dict):
+    from controlnet_generator import StoryboardImageGenerator
+    generator = StoryboardImageGenerator(profile=profile)
+    (canny_image, _), (pose_image, _) = generator.control_images(CONTROLNET_SCENE)
+    extra = {'image': [canny_image, pose_image], 'controlnet_conditioning_scale': [0.5, 0.5]}
+    return generator.pipe, extra
+
+
+def peak_resident_mb() -> float:
+    """High-water mark of this process's resident set"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def render_all(load: Callable, profile: Dict, prompts: List[str], steps: int, seed: int,
+               output_dir: Optional[str], label: str) -> Dict:
+    """Load a pipeline with ``profile`` and render every prompt on the same seed.
+
+    Meant to run in a fresh process (see render_variant), so the memory
+    figures are not skewed by what another variant left in the allocator.
+    """
+    rss_before = resident_mb()
+    start = time.perf_counter()
+    pipe, extra = load(profile)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = resident_mb()
+
+    images, seconds, seconds_per_step = [], [], []
+    for index, prompt in enumerate(prompts):
+        timer = StepTimer()
+        start = time.perf_counter()
+        image = pipe(
+            prompt,
+            num_inference_steps=steps,
+            guidance_scale=7.5,
+            generator=torch.Generator(device='cpu').manual_seed(seed),
+            callback_on_step_end=timer,
+            **extra
+        ).images[0]
+        seconds.append(time.perf_counter() - start)
+        seconds_per_step.append(timer.seconds_per_step)
+        images.append(np.asarray(image.convert('RGB')))
+        if output_dir:
+            image.save(os.path.join(output_dir, f"{label}_{index}.png"))
+
+    return {
+        'load_seconds': round(load_seconds, 2),
+        'resident_mb': round(rss_loaded - rss_before, 1),
+        'peak_mb': peak_resident_mb(),
+        'weights_mb': pipeline_weights_mb(pipe),
+        'seconds': [round(value, 3) for value in seconds],
+        'seconds_per_step': round(float(np.mean(seconds_per_step)), 4),
+        'images': images
+    }
+
+
+def render_variant(*args) -> Dict:
+    """render_all in a freshly spawned process, which exits (and frees everything) afterwards"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(render_all, *args).result()
+
+
+def compare(baseline: Dict, quantized: Dict, prompts: List[str]) -> Dict:
+    per_prompt = []
+    for index, prompt in enumerate(prompts):
+        entry = {'prompt': prompt}
+        entry.update(image_difference(baseline['images'][index], quantized['images'][index]))
+        entry['float32_seconds'] = baseline['seconds'][index]
+        entry['int8_seconds'] = quantized['seconds'][index]
+        per_prompt.append(entry)
+
+    float32_weights = sum(baseline['weights_mb'].values())
+    int8_weights = sum(quantized['weights_mb'].values())
+    psnr = [entry['psnr'] for entry in per_prompt]
+    return {
+        'prompts': per_prompt,
+        'quality': {
+            'mean_psnr': round(float(np.mean(psnr)), 2),
+            'min_psnr': min(psnr),
+            'mean_mae': round(float(np.mean([entry['mae'] for entry in per_prompt])), 3)
+        },
+        'memory': {
+            'float32_weights_mb': baseline['weights_mb'],
+            'int8_weights_mb': quantized['weights_mb'],
+            'weights_saved_mb': round(float32_weights - int8_weights, 1),
+            'float32_resident_mb': baseline['resident_mb'],
+            'int8_resident_mb': quantized['resident_mb'],
+            'resident_saved_mb': round(baseline['resident_mb'] - quantized['resident_mb'], 1),
+            'float32_peak_mb': baseline['peak_mb'],
+            'int8_peak_mb': quantized['peak_mb']
+        },
+        'latency': {
+            'float32_seconds_per_step': baseline['seconds_per_step'],
+            'int8_seconds_per_step': quantized['seconds_per_step'],
+            'change': round(quantized['seconds_per_step'] / baseline['seconds_per_step'] - 1, 3)
+            if baseline['seconds_per_step'] else None,
+            'float32_load_seconds': baseline['load_seconds'],
+            'int8_load_seconds': quantized['load_seconds']
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare int8-quantized CPU rendering with the float32 baseline')
+    parser.add_argument('--pipeline', choices=['sd', 'controlnet'], default='sd',
+                        help='image_generator (sd) or controlnet_generator pipeline')
+    parser.add_argument('--prompts', help='File with one prompt per line instead of the built-in set')
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS, help='Denoising steps per image')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed used for every image')
+    parser.add_argument('--image-dir', help='Save the baseline and quantized images here')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--min-psnr', type=float, help='Fail if any image falls below this PSNR (dB) against the baseline')
+
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, 'r') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    if args.image_dir:
+        os.makedirs(args.image_dir, exist_ok=True)
+
+    load = load_controlnet if args.pipeline == 'controlnet' else load_sd
+    # Same profile for both runs apart from quantization; bf16 would confound the comparison
+    profile = dict(cpu_profile(), bf16=False, quantize='none')
+    # Each variant loads and renders in its own process so the memory figures are independent
+    baseline = render_variant(load, profile, prompts, args.steps, args.seed, args.image_dir, 'float32')
+    quantized = render_variant(load, dict(profile, quantize='int8'), prompts, args.steps, args.seed,
+                               args.image_dir, 'int8')
+
+    report = {'pipeline': args.pipeline, 'steps': args.steps, 'seed': args.seed, 'threads': profile['threads']}
+    report.update(compare(baseline, quantized, prompts))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.min_psnr is not None and report['quality']['min_psnr'] < args.min_psnr:
+        print(f"Quantized output below {args.min_psnr} dB PSNR against the float32 baseline", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
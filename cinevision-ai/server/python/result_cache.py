@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Optional
+
+from screenplay_parser import screenplay_text
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'temp', 'cache')
+DEFAULT_MAX_MB = 256
+DEFAULT_MEMORY_ITEMS = 128
+
+# Returned by lookups that found nothing, since None is a valid result
+MISS = object()
+
+
+class ResultCache:
+    """Two-tier cache of analyzer results keyed by script hash, analyzer name and version.
+
+    Values are stored as JSON text in both tiers so callers always get a
+    fresh copy they are free to mutate.  The memory tier is an LRU bounded by
+    entry count; the SQLite tier is bounded by total value size and evicts
+    the least recently used rows first.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.db = None
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, analyzer TEXT, value TEXT, size INTEGER, accessed REAL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            self.db.commit()
+
+    @staticmethod
+    def make_key(name: str, version, script_text: str) -> str:
+        digest = hashlib.sha256(script_text.encode('utf-8')).hexdigest()
+        return f'{name}:{version}:{digest}'
+
+    def get(self, name: str, version, script_text: str):
+        key = self.make_key(name, version, script_text)
+
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+                self.counters[(name, 'memory_hits')] += 1
+                return json.loads(value)
+
+            if self.db is not None:
+                row = self.db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row:
+                    self.db.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+                    self.db.commit()
+                    self.remember(key, row[0])
+                    self.counters[(name, 'disk_hits')] += 1
+                    return json.loads(row[0])
+
+            self.counters[(name, 'misses')] += 1
+            return MISS
+
+    def put(self, name: str, version, script_text: str, result):
+        key = self.make_key(name, version, script_text)
+        value = json.dumps(result)
+
+        with self.lock:
+            self.remember(key, value)
+
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO results (key, analyzer, value, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, name, value, len(value), time.time())
+                )
+                self.evict()
+                self.db.commit()
+
+    def remember(self, key: str, value: str):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """Drop least recently used rows until the disk tier fits in max_bytes"""
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self.db.execute('SELECT key, size FROM results ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.db.executemany('DELETE FROM results WHERE key = ?', stale)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters in total and per analyzer"""
+        with self.lock:
+            by_analyzer = {}
+            for (name, kind), count in self.counters.items():
+                by_analyzer.setdefault(name, Counter())[kind] += count
+
+        def summarize(counts):
+            hits = counts['memory_hits'] + counts['disk_hits']
+            lookups = hits + counts['misses']
+            return {
+                'memory_hits': counts['memory_hits'],
+                'disk_hits': counts['disk_hits'],
+                'misses': counts['misses'],
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
+
+        summary = summarize(sum(by_analyzer.values(), Counter()))
+        summary['analyzers'] = {name: summarize(counts) for name, counts in by_analyzer.items()}
+        return summary
+
+
+_cache = None
+_cache_configured = False
+
+
+def configure(enabled: bool = True, path: Optional[str] = None, max_bytes: Optional[int] = None,
+              memory_items: Optional[int] = None):
+    """Replace the process-wide cache; settings default to the ANALYSIS_CACHE_* environment"""
+    global _cache, _cache_configured
+    _cache_configured = True
+
+    if not enabled:
+        _cache = None
+        return None
+
+    if path is None:
+        path = os.path.join(os.getenv('ANALYSIS_CACHE_DIR', DEFAULT_CACHE_DIR), 'analysis_results.sqlite')
+    if max_bytes is None:
+        max_bytes = int(float(os.getenv('ANALYSIS_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    if memory_items is None:
+        memory_items = int(os.getenv('ANALYSIS_CACHE_MEMORY_ITEMS', DEFAULT_MEMORY_ITEMS))
+
+    _cache = ResultCache(path or None, max_bytes, memory_items)
+    return _cache
+
+
+def get_cache() -> Optional[ResultCache]:
+    """Process-wide cache, created on first use unless ANALYSIS_CACHE=0"""
+    if not _cache_configured:
+        configure(enabled=os.getenv('ANALYSIS_CACHE', '1').lower() not in ('0', 'false', 'off'))
+    return _cache
+
+
+def cache_stats() -> Dict:
+    cache = get_cache()
+    return cache.stats() if cache else {'enabled': False}
+
+
+def lookup(func: Callable, script_text: str):
+    """Cached result for a wrapped analyzer, or MISS"""
+    cache = get_cache()
+    if cache is None:
+        return MISS
+    return cache.get(func.cache_name, func.cache_version, script_text)
+
+
+def store(func: Callable, script_text: str, result):
+    cache = get_cache()
+    if cache is not None:
+        cache.put(func.cache_name, func.cache_version, script_text, result)
+
+
+def cached_analysis(name: str, version):
+    """Wrap a public analyzer so results are reused for identical script text.
+
+    Bump ``version`` whenever the analyzer's output changes, otherwise stale
+    results keep being served from the disk tier.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(script, *args, **kwargs):
+            # Streams are analyzed as they are read, so there is nothing to hash up front
+            if get_cache() is None or args or kwargs or not isinstance(script, (str, dict)):
+                return func(script, *args, **kwargs)
+
+            script_text = script if isinstance(script, str) else screenplay_text(script)
+            result = lookup(wrapper, script_text)
+            if result is MISS:
+                result = func(script)
+                store(wrapper, script_text, result)
+            return result
+
+        wrapper.cache_name = name
+        wrapper.cache_version = version
+        return wrapper
+    return decorator
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from result_cache import DEFAULT_CACHE_DIR
+from screenplay_parser import scene_blocks, tokenize_block
+
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_MB = 64
+
+# New disk rows are written in one transaction once this many are waiting (or on flush)
+FLUSH_EVERY = 256
+
+
+class SceneCache:
+    """Two-tier cache of per-scene analysis pieces keyed by analyzer, version and a hash of the scene text.
+
+    Pieces are stored as JSON text, so every caller gets a fresh copy.  The
+    memory tier is an LRU bounded by entry count.  The optional SQLite tier
+    is shared by every process using the same file (each analysis pool
+    process, later runs), is bounded by total value size and evicts the
+    least recently used rows first.  Its writes are batched; call ``flush``
+    once a script is done.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.touched = {}
+        self.db = None
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS pieces (key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS pieces_accessed ON pieces (accessed)')
+            self.db.commit()
+
+    def get_or_compute(self, namespace: str, version, text: str, compute: Callable[[str], object]):
+        key = f'{namespace}:{version}:{scene_digest(text)}'
+
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return json.loads(value)
+
+            if self.db is not None:
+                row = self.db.execute('SELECT value FROM pieces WHERE key = ?', (key,)).fetchone()
+                if row:
+                    self.touched[key] = time.time()
+                    self.remember(key, row[0])
+                    self.counters['disk_hits'] += 1
+                    return json.loads(row[0])
+
+        piece = compute(text)
+        value = json.dumps(piece)
+
+        with self.lock:
+            self.counters['misses'] += 1
+            self.remember(key, value)
+            if self.db is not None:
+                self.pending[key] = value
+                if len(self.pending) >= FLUSH_EVERY:
+                    self.write_pending()
+        # The cache holds its own JSON copy, so the computed piece can go straight back
+        return piece
+
+    def remember(self, key: str, value: str):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def flush(self):
+        """Write new pieces and access times to the disk tier"""
+        with self.lock:
+            if self.db is not None and (self.pending or self.touched):
+                self.write_pending()
+
+    def write_pending(self):
+        now = time.time()
+        self.db.executemany(
+            'INSERT OR REPLACE INTO pieces (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+            [(key, value, len(value), now) for key, value in self.pending.items()]
+        )
+        self.db.executemany('UPDATE pieces SET accessed = ? WHERE key = ?',
+                            [(accessed, key) for key, accessed in self.touched.items()])
+        self.evict()
+        self.db.commit()
+        self.pending.clear()
+        self.touched.clear()
+
+    def evict(self):
+        """Drop least recently used rows until the disk tier fits in max_bytes"""
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM pieces').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self.db.execute('SELECT key, size FROM pieces ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.db.executemany('DELETE FROM pieces WHERE key = ?', stale)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'memory_hits': self.counters['memory_hits'],
+                'disk_hits': self.counters['disk_hits'],
+                'misses': self.counters['misses']
+            }
+
+    def clear(self):
+        """Forget the memory tier and counters; the disk tier is left alone"""
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+
+def scene_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+_cache = None
+_cache_configured = False
+
+
+def configure(enabled: bool = True, path: Optional[str] = None, max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> Optional[SceneCache]:
+    """Replace the process-wide scene cache; settings default to the SCENE_CACHE_* environment.
+
+    ``path=''`` keeps the cache in memory only.
+    """
+    global _cache, _cache_configured
+    _cache_configured = True
+
+    if not enabled:
+        _cache = None
+        return None
+
+    if path is None:
+        path = os.path.join(os.getenv('ANALYSIS_CACHE_DIR', DEFAULT_CACHE_DIR), 'scene_pieces.sqlite')
+    if max_entries is None:
+        max_entries = int(os.getenv('SCENE_CACHE_ENTRIES', DEFAULT_MAX_ENTRIES))
+    if max_bytes is None:
+        max_bytes = int(float(os.getenv('SCENE_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+
+    _cache = SceneCache(path or None, max_entries, max_bytes)
+    return _cache
+
+
+def get_cache() -> Optional[SceneCache]:
+    """Process-wide scene cache, created on first use unless SCENE_CACHE=0"""
+    if not _cache_configured:
+        configure(enabled=os.getenv('SCENE_CACHE', '1').lower() not in ('0', 'false', 'off'))
+    return _cache
+
+
+def memoize_scene(namespace: str, version, text: str, compute: Callable[[str], object]):
+    """Run ``compute(text)`` once per distinct scene text and analyzer version; the result must be JSON"""
+    cache = get_cache()
+    if cache is None:
+        return compute(text)
+    return cache.get_or_compute(namespace, version, text, compute)
+
+
+def scene_pieces(script, namespace: str, version, summarize: Callable[[Dict], object]) -> Iterator[Tuple[int, object]]:
+    """Yield (scene number, summarize(scene)) for every scene, preamble (0) first.
+
+    Pieces come from the cache by scene text.  Raw script text is split at
+    its headings and only the scenes that miss are tokenized, so re-running
+    an analyzer on an edited script costs about as much as the edited scenes.
+    Pieces must not depend on the scene's number or line numbers.
+    """
+    for number, block, scene in scene_blocks(script):
+        yield number, memoize_scene(namespace, version, block,
+                                    lambda text: summarize(scene if scene is not None else tokenize_block(text)))
+    flush()
+
+
+def flush():
+    cache = get_cache()
+    if cache is not None:
+        cache.flush()
+
+
+def cache_stats() -> Dict:
+    cache = get_cache()
+    return cache.stats() if cache else {'enabled': False}
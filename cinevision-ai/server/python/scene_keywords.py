@@ -0,0 +1,66 @@
+from typing import Dict, Iterable, List, Tuple
+
+from keyword_matcher import build_keyword_matcher
+from screenplay_parser import scene_block
+
+# Group name -> lowercase keywords; each analyzer adds its groups at import time
+KEYWORD_GROUPS: Dict[str, Tuple[str, ...]] = {}
+
+# Scene key the scan is kept under, so analyzers folding the same scene share it
+SCAN_KEY = 'keyword_scan'
+
+_scanner = None
+
+
+def register_keywords(group: str, keywords: Iterable[str]):
+    """Add (or replace) a group of keywords in the shared per-scene scan"""
+    global _scanner
+    KEYWORD_GROUPS[group] = tuple(dict.fromkeys(keyword.lower() for keyword in keywords))
+    _scanner = None
+
+
+def shared_scanner():
+    """One matcher over every registered keyword, plus keyword -> groups it belongs to"""
+    global _scanner
+    if _scanner is None:
+        keyword_groups = {}
+        for group, keywords in KEYWORD_GROUPS.items():
+            for keyword in keywords:
+                keyword_groups.setdefault(keyword, []).append(group)
+        _scanner = build_keyword_matcher(keyword_groups), keyword_groups
+    return _scanner
+
+
+def scan_text(text: str) -> Dict:
+    """Find every registered keyword in the text with a single scan.
+
+    ``hits`` maps each group to its (keyword, offset) hits in text order,
+    longest keyword first where several start at one offset.  Matching is
+    on ``text.lower()``, whose offsets match ``text`` unless it contains a
+    dotted capital I.
+    """
+    (pattern, prefixes), keyword_groups = shared_scanner()
+    lowered = text.lower()
+    hits = {group: [] for group in KEYWORD_GROUPS}
+
+    for match in pattern.finditer(lowered):
+        longest = match.group(1)
+        position = match.start()
+        for keyword in (longest, *reversed(prefixes[longest])):
+            for group in keyword_groups[keyword]:
+                hits[group].append((keyword, position))
+
+    return {'text': text, 'hits': hits}
+
+
+def scene_scan(scene: Dict) -> Dict:
+    """scan_text of the scene's scene_block, run once per scene however many analyzers ask"""
+    scan = scene.get(SCAN_KEY)
+    if scan is None or any(group not in scan['hits'] for group in KEYWORD_GROUPS):
+        scan = scene[SCAN_KEY] = scan_text(scene_block(scene))
+    return scan
+
+
+def keyword_hits(scene: Dict, group: str) -> List[Tuple[str, int]]:
+    return scene_scan(scene)['hits'][group]
+
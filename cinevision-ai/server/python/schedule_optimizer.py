@@ -0,0 +1,351 @@
+import argparse
+import heapq
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from screenplay_parser import CHARACTER, is_preamble, iter_scenes
+
+DEFAULT_PAGES_PER_DAY = 5.0
+LINES_PER_PAGE = 55
+# Rule of thumb: one script page runs about a minute on screen
+MINUTES_PER_PAGE = 1.0
+NIGHT_TIMES = ('NIGHT', 'EVENING', 'DUSK')
+
+# Weights of the block-ordering objective
+MOVE_WEIGHT = 10.0
+FLIP_WEIGHT = 4.0
+CAST_WEIGHT = 3.0
+
+# Candidate next blocks kept per block for the 2-opt pass
+NEIGHBOURS = 8
+
+# The greedy pass scores every unplaced block while there are at most this many
+SCORE_ALL_BELOW = 256
+
+DEFAULT_TIME_LIMIT = 5.0
+
+
+def scene_shift(time_of_day: str) -> str:
+    return 'NIGHT' if time_of_day in NIGHT_TIMES else 'DAY'
+
+
+def page_eighths(scene: Dict) -> int:
+    """Estimated page length of a tokenized scene, in eighths of a page"""
+    lines = scene['end_line'] - scene['start_line'] + 1
+    return max(1, round(lines * 8 / LINES_PER_PAGE))
+
+
+def strip_for_scene(scene: Dict) -> Dict:
+    """The facts the scheduler needs from a tokenized scene (one stripboard strip)"""
+    cast = [element['name'] for element in scene['elements'] if element['type'] == CHARACTER]
+    return {
+        'scene_number': scene['scene_number'],
+        'location_type': scene['location_type'],
+        'location': scene['location'],
+        'time': scene['time'],
+        'eighths': page_eighths(scene),
+        'cast': list(dict.fromkeys(cast))
+    }
+
+
+def strip_length(strip: Dict, unit: str) -> float:
+    pages = strip['eighths'] / 8
+    if unit == 'minutes':
+        return strip.get('minutes', pages * MINUTES_PER_PAGE)
+    return pages
+
+
+def build_blocks(strips: List[Dict], cast_bits: Dict[str, int]) -> List[Dict]:
+    """Group strips shot at the same location in the same shift, in script order"""
+    blocks = {}
+    for strip in strips:
+        key = (strip['location'], scene_shift(strip['time']))
+        block = blocks.get(key)
+        if block is None:
+            block = blocks[key] = {'location': key[0], 'shift': key[1], 'strips': [], 'cast': 0,
+                                   'first': strip['scene_number']}
+        block['strips'].append(strip)
+        for name in strip['cast']:
+            block['cast'] |= cast_bits[name]
+    return list(blocks.values())
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+def transition_cost(a: Dict, b: Dict) -> float:
+    """Cost of shooting block b straight after block a"""
+    cost = 0.0
+    if a['location'] != b['location']:
+        cost += MOVE_WEIGHT
+    if a['shift'] != b['shift']:
+        cost += FLIP_WEIGHT
+
+    union = a['cast'] | b['cast']
+    if union:
+        cost += CAST_WEIGHT * (1 - popcount(a['cast'] & b['cast']) / popcount(union))
+    return cost
+
+
+class BlockQueues:
+    """Unplaced blocks in script order under any number of keys, with constant-time removal"""
+
+    def __init__(self):
+        self.heads = {}
+        self.tails = {}
+        # (key, block) -> [previous block, next block]
+        self.links = {}
+
+    def append(self, key, block: int):
+        tail = self.tails.get(key)
+        self.links[key, block] = [tail, None]
+        if tail is None:
+            self.heads[key] = block
+        else:
+            self.links[key, tail][1] = block
+        self.tails[key] = block
+
+    def remove(self, key, block: int):
+        previous, following = self.links.pop((key, block))
+        if previous is None:
+            self.heads[key] = following
+        else:
+            self.links[key, previous][1] = following
+        if following is None:
+            self.tails[key] = previous
+        else:
+            self.links[key, following][0] = previous
+
+    def first(self, key, count: int) -> List[int]:
+        found = []
+        block = self.heads.get(key)
+        while block is not None and len(found) < count:
+            found.append(block)
+            block = self.links[key, block][1]
+        return found
+
+
+def cast_members(bits: int) -> List[int]:
+    members = []
+    while bits:
+        low = bits & -bits
+        members.append(low.bit_length() - 1)
+        bits ^= low
+    return members
+
+
+def block_keys(block: Dict) -> List[tuple]:
+    """Queues a block waits in: its location, its shift and whether it has cast, and each cast member"""
+    keys = [('location', block['location']), ('kind', block['shift'], bool(block['cast']))]
+    keys.extend(('cast', member) for member in cast_members(block['cast']))
+    return keys
+
+
+def greedy_order(blocks: List[Dict], deadline: float = float('inf')) -> Tuple[List[int], List[List[int]]]:
+    """Nearest-neighbour ordering starting from the block holding the earliest scene.
+
+    Once more than SCORE_ALL_BELOW blocks are unplaced only a handful are
+    scored at each step: the other shift at the same location, the earliest
+    unplaced blocks sharing each cast member, and the earliest unplaced block
+    of every shift with and without cast.  Any other block costs exactly as
+    much as the earliest block of its kind, so the pick is usually the true
+    nearest block, at a cost independent of the number of blocks.  If the
+    deadline passes the rest keep script order.
+
+    Also returns, for every block, the few cheapest blocks that were still
+    unplaced when it was placed; 2-opt only tries those as new neighbours.
+    """
+    by_script = sorted(range(len(blocks)), key=lambda i: blocks[i]['first'])
+    keys = [block_keys(block) for block in blocks]
+    queues = BlockQueues()
+    for index in by_script:
+        for key in keys[index]:
+            queues.append(key, index)
+    kinds = [('kind', shift, has_cast) for shift in ('DAY', 'NIGHT') for has_cast in (False, True)]
+
+    remaining = set(by_script)
+    neighbours = [[] for _ in blocks]
+    current = by_script[0]
+    order = []
+
+    while True:
+        order.append(current)
+        remaining.remove(current)
+        for key in keys[current]:
+            queues.remove(key, current)
+        if not remaining:
+            break
+        if time.perf_counter() >= deadline:
+            order.extend(sorted(remaining, key=lambda i: blocks[i]['first']))
+            break
+
+        block = blocks[current]
+        if len(remaining) <= SCORE_ALL_BELOW:
+            candidates = remaining
+        else:
+            # Only the earliest block of a kind can be the cheapest of that kind
+            candidates = set()
+            for key in kinds + keys[current][:1]:
+                candidates.update(queues.first(key, 1))
+            for key in keys[current][2:]:
+                candidates.update(queues.first(key, NEIGHBOURS))
+
+        # Ties go to the block that comes first in the script
+        scored = [(transition_cost(block, blocks[i]), blocks[i]['first'], i) for i in candidates]
+        neighbours[current] = [i for _, _, i in heapq.nsmallest(NEIGHBOURS, scored)]
+        current = neighbours[current][0]
+    return order, neighbours
+
+
+def improve_order(blocks: List[Dict], order: List[int], neighbours: List[List[int]], deadline: float) -> List[int]:
+    """2-opt on the block sequence until no reversal helps or the deadline passes.
+
+    A reversal of order[i:j+1] replaces the edges (i-1, i) and (j, j+1) with
+    (i-1, j) and (i, j+1); only moves whose new edge (i-1, j) joins a block
+    to one of its neighbours are tried.
+    """
+    costs = {}
+
+    def cost(a, b):
+        key = (a, b) if a < b else (b, a)
+        if key not in costs:
+            costs[key] = transition_cost(blocks[a], blocks[b])
+        return costs[key]
+
+    order = list(order)
+    position = {block: index for index, block in enumerate(order)}
+    count = len(order)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, count - 1):
+            previous = order[i - 1]
+            for candidate in neighbours[previous]:
+                j = position[candidate]
+                if j <= i:
+                    continue
+                before = cost(previous, order[i])
+                after = cost(previous, order[j])
+                if j + 1 < count:
+                    before += cost(order[j], order[j + 1])
+                    after += cost(order[i], order[j + 1])
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    for index in range(i, j + 1):
+                        position[order[index]] = index
+                    improved = True
+                    break
+            if time.perf_counter() >= deadline:
+                break
+    return order
+
+
+def pack_days(strips: List[Dict], budget: float, unit: str) -> List[List[Dict]]:
+    """Fill shooting days in strip order, starting a new day when the next strip does not fit"""
+    days = []
+    current = []
+    used = 0.0
+    for strip in strips:
+        length = strip_length(strip, unit)
+        if current and used + length > budget:
+            days.append(current)
+            current = []
+            used = 0.0
+        current.append(strip)
+        used += length
+    if current:
+        days.append(current)
+    return days
+
+
+def schedule_metrics(days: List[List[Dict]]) -> Dict:
+    """Company moves and day/night flips within days, and cast carry days across the schedule"""
+    moves = 0
+    flips = 0
+    worked = {}
+
+    for day_index, day in enumerate(days):
+        for previous, strip in zip(day, day[1:]):
+            moves += previous['location'] != strip['location']
+            flips += scene_shift(previous['time']) != scene_shift(strip['time'])
+        for strip in day:
+            for name in strip['cast']:
+                worked.setdefault(name, set()).add(day_index)
+
+    # Days a cast member is held between their first and last shooting day without working
+    carry_days = sum(max(days_worked) - min(days_worked) + 1 - len(days_worked) for days_worked in worked.values())
+
+    return {
+        'company_moves': moves,
+        'day_night_flips': flips,
+        'cast_carry_days': carry_days
+    }
+
+
+def build_schedule(strips: List[Dict], pages_per_day: float = DEFAULT_PAGES_PER_DAY,
+                   minutes_per_day: Optional[float] = None,
+                   time_limit: float = DEFAULT_TIME_LIMIT) -> Dict:
+    """Order strips into shooting days under a page (or minutes) budget.
+
+    Scenes at the same location and shift are kept together as blocks.  The
+    blocks are ordered greedily by the cost of moving between them (company
+    moves, day/night flips and cast changes) and then improved with 2-opt
+    until nothing improves; both passes stop once ``time_limit`` seconds
+    pass.  Days are filled in that order.
+    """
+    deadline = time.perf_counter() + time_limit
+    unit, budget = ('minutes', minutes_per_day) if minutes_per_day else ('pages', pages_per_day)
+
+    if not strips:
+        return {'estimated_days': 0, 'budget': {'unit': unit, 'per_day': budget}, 'days': [],
+                'metrics': schedule_metrics([])}
+
+    cast_bits = {}
+    for strip in strips:
+        for name in strip['cast']:
+            cast_bits.setdefault(name, 1 << len(cast_bits))
+
+    blocks = build_blocks(strips, cast_bits)
+    order, neighbours = greedy_order(blocks, deadline)
+    order = improve_order(blocks, order, neighbours, deadline)
+    ordered_strips = [strip for index in order for strip in blocks[index]['strips']]
+    days = pack_days(ordered_strips, budget, unit)
+
+    schedule_days = []
+    for number, day in enumerate(days, 1):
+        schedule_days.append({
+            'day': number,
+            'scene_numbers': [strip['scene_number'] for strip in day],
+            'locations': list(dict.fromkeys(strip['location'] for strip in day)),
+            'shifts': list(dict.fromkeys(scene_shift(strip['time']) for strip in day)),
+            'cast': list(dict.fromkeys(name for strip in day for name in strip['cast'])),
+            unit: round(sum(strip_length(strip, unit) for strip in day), 3)
+        })
+
+    return {
+        'estimated_days': len(days),
+        'budget': {'unit': unit, 'per_day': budget},
+        'days': schedule_days,
+        'metrics': schedule_metrics(days)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a shooting schedule for a screenplay')
+    parser.add_argument('script', help='Path to the script file')
+    parser.add_argument('--pages-per-day', type=float, default=DEFAULT_PAGES_PER_DAY, help='Page budget per day')
+    parser.add_argument('--minutes-per-day', type=float, help='Budget per day in screen minutes instead of pages')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, help='Seconds to spend improving the order')
+
+    args = parser.parse_args()
+
+    with open(args.script, 'r') as f:
+        strips = [strip_for_scene(scene) for scene in iter_scenes(f) if not is_preamble(scene)]
+
+    print(json.dumps(build_schedule(strips, args.pages_per_day, args.minutes_per_day, args.time_limit), indent=2))
+
+if __name__ == "__main__":
+    main()
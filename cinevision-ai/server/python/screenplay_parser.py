@@ -0,0 +1,270 @@
+import mmap
+import os
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+# Element types produced by the tokenizer
+HEADING = 'heading'
+ACTION = 'action'
+CHARACTER = 'character'
+PARENTHETICAL = 'parenthetical'
+DIALOGUE = 'dialogue'
+TRANSITION = 'transition'
+
+SCENE_PREFIXES = ('INT/EXT.', 'INT.', 'EXT.')
+TRANSITION_SUFFIXES = ('TO:', 'WITH:', 'IN:', 'OUT:')
+
+TIME_PATTERN = re.compile(r'(?:DAWN|DAY|DUSK|NIGHT|MORNING|AFTERNOON|EVENING)')
+HEADING_SEPARATOR = re.compile(r'\s*[—–]\s*|\s+-+\s+|--')
+CUE_EXTENSION = re.compile(r'\s*\([^)]*\)\s*$')
+# Start of a line is_heading accepts once stripped (whitespace other than the newline may lead)
+HEADING_LINE = re.compile(r'^[^\S\n]*(?:INT/EXT\.|INT\.|EXT\.)', re.MULTILINE)
+
+
+def parse_heading(line: str) -> Dict:
+    """Split a scene heading into location type, location and time of day"""
+    location_type = next(prefix for prefix in SCENE_PREFIXES if line.startswith(prefix))
+    rest = line[len(location_type):].strip()
+
+    parts = HEADING_SEPARATOR.split(rest)
+    time_match = TIME_PATTERN.search(rest)
+
+    return {
+        'location_type': location_type,
+        'location': parts[0].strip(),
+        'time': time_match.group(0) if time_match else 'DAY'
+    }
+
+
+def is_heading(line: str) -> bool:
+    return line.startswith(SCENE_PREFIXES)
+
+
+def is_parenthetical(line: str) -> bool:
+    return line.startswith('(') and line.endswith(')')
+
+
+def is_transition(line: str) -> bool:
+    return line.isupper() and line.endswith(TRANSITION_SUFFIXES)
+
+
+def is_cue(line: str, next_line: str) -> bool:
+    """A cue is an all-caps line directly followed by dialogue or a parenthetical"""
+    if not line.isupper() or not next_line or is_heading(next_line):
+        return False
+    return not next_line.isupper() or is_parenthetical(next_line)
+
+
+def new_scene(heading: str, line_number: int, number: int) -> Dict:
+    scene = {
+        'scene_number': number,
+        'heading': heading,
+        'start_line': line_number,
+        'end_line': line_number,
+        'elements': [],
+        'content': ''
+    }
+    scene.update(parse_heading(heading))
+    return scene
+
+
+def new_preamble() -> Dict:
+    """Pseudo-scene holding the elements before the first heading (title page, FADE IN:)"""
+    return {
+        'scene_number': 0,
+        'heading': None,
+        'start_line': 1,
+        'end_line': 0,
+        'elements': [],
+        'content': ''
+    }
+
+
+def is_preamble(scene: Dict) -> bool:
+    return scene['heading'] is None
+
+
+def with_lookahead(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Pair every line with the one after it ('' after the last line)"""
+    iterator = iter(lines)
+    current = next(iterator, None)
+    while current is not None:
+        following = next(iterator, None)
+        yield current, following if following is not None else ''
+        current = following
+
+
+def iter_screenplay(lines: Iterable[str]) -> Iterator[Dict]:
+    """Tokenize line by line, yielding each scene as soon as it is complete.
+
+    ``lines`` can be a list, an open file or any other iterable of lines, so
+    only the scene being built is held in memory.  Every element is a dict
+    with ``type``, ``text`` and 1-based ``line``; cues carry the speaker
+    ``name`` and dialogue/parentheticals inside a speech carry the
+    ``character`` who is speaking.  Elements before the first heading are
+    yielded first as a preamble pseudo-scene, if there are any.
+    """
+    current_scene = new_preamble()
+    elements = current_scene['elements']
+    content_lines = []
+    speaker = None
+    number = 0
+
+    for line_number, (raw_line, next_raw_line) in enumerate(with_lookahead(lines), 1):
+        raw_line = raw_line.rstrip('\n')
+        line = raw_line.strip()
+
+        if is_heading(line):
+            if current_scene['elements'] or not is_preamble(current_scene):
+                current_scene['content'] = '\n'.join(content_lines)
+                yield current_scene
+            number += 1
+            current_scene = new_scene(line, line_number, number)
+            elements = current_scene['elements']
+            content_lines = []
+            speaker = None
+            continue
+
+        content_lines.append(raw_line)
+        current_scene['end_line'] = line_number
+
+        # Blank lines end the current speech
+        if not line:
+            speaker = None
+            continue
+
+        if speaker:
+            element_type = PARENTHETICAL if is_parenthetical(line) else DIALOGUE
+            elements.append({'type': element_type, 'text': line, 'line': line_number, 'character': speaker})
+            continue
+
+        next_line = next_raw_line.strip()
+
+        if is_transition(line):
+            elements.append({'type': TRANSITION, 'text': line, 'line': line_number})
+        elif is_parenthetical(line):
+            elements.append({'type': PARENTHETICAL, 'text': line, 'line': line_number, 'character': None})
+        elif is_cue(line, next_line):
+            speaker = CUE_EXTENSION.sub('', line) or line
+            elements.append({'type': CHARACTER, 'text': line, 'line': line_number, 'name': speaker})
+        else:
+            elements.append({'type': ACTION, 'text': line, 'line': line_number})
+
+    if current_scene['elements'] or not is_preamble(current_scene):
+        current_scene['content'] = '\n'.join(content_lines)
+        yield current_scene
+
+
+def tokenize_screenplay(script_text: str) -> Dict:
+    """Walk the script once and build the shared scene/element representation"""
+    preamble = []
+    scenes = []
+
+    lines = script_text.split('\n')
+    for scene in iter_screenplay(lines):
+        if is_preamble(scene):
+            preamble = scene['elements']
+        else:
+            scenes.append(scene)
+
+    return {
+        'text': script_text,
+        'preamble': preamble,
+        'scenes': scenes,
+        'line_count': len(lines)
+    }
+
+
+def as_screenplay(script: Union[str, Dict]) -> Dict:
+    """Accept either raw script text or an already tokenized screenplay"""
+    if isinstance(script, str):
+        return tokenize_screenplay(script)
+    return script
+
+
+def iter_scenes(script) -> Iterator[Dict]:
+    """Scenes of raw text, a tokenized screenplay or a stream of lines, preamble first.
+
+    Streams (open files, mmap_lines) are tokenized lazily, one scene at a
+    time, so analyzers built on this only ever hold a single scene.
+    """
+    if isinstance(script, str):
+        yield from iter_screenplay(script.split('\n'))
+    elif isinstance(script, dict):
+        if script['preamble']:
+            preamble = new_preamble()
+            preamble['elements'] = script['preamble']
+            yield preamble
+        yield from script['scenes']
+    else:
+        yield from iter_screenplay(script)
+
+
+def mmap_lines(path: str, encoding: str = 'utf-8') -> Iterator[str]:
+    """Read a script file line by line through mmap instead of loading it whole"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b''):
+                yield line.decode(encoding, errors='replace').rstrip('\r\n')
+
+
+def scene_block(scene: Dict) -> str:
+    """Text a keyword search should see for one scene (heading and body, or the preamble)"""
+    if is_preamble(scene):
+        return '\n'.join(element['text'] for element in scene['elements'])
+    # A heading with nothing after it differs from one followed by a single blank line
+    if scene['end_line'] == scene['start_line']:
+        return scene['heading']
+    return scene['heading'] + '\n' + scene['content']
+
+
+def scene_blocks(script) -> Iterator[Tuple[int, str, Optional[Dict]]]:
+    """Yield (scene number, scene_block text, tokenized scene) for every scene, preamble (0) first.
+
+    Raw text is cut at its heading lines without being tokenized and the
+    scene is None; tokenize_block turns the text into the same scene when it
+    is needed.  Callers keeping per-scene results by block text therefore
+    only tokenize the scenes that changed.
+    """
+    if not isinstance(script, str):
+        for scene in iter_scenes(script):
+            yield scene['scene_number'], scene_block(scene), scene
+        return
+
+    starts = [match.start() for match in HEADING_LINE.finditer(script)]
+
+    # Lines before the first heading; the newline ending them belongs to neither side
+    preamble_end = starts[0] - 1 if starts else len(script)
+    if preamble_end >= 0:
+        for preamble in iter_screenplay(script[:preamble_end].split('\n')):
+            yield 0, scene_block(preamble), preamble
+
+    for number, start in enumerate(starts, 1):
+        end = starts[number] - 1 if number < len(starts) else len(script)
+        heading_end = script.find('\n', start, end)
+        if heading_end == -1:
+            yield number, script[start:end].strip(), None
+        else:
+            yield number, script[start:heading_end].strip() + '\n' + script[heading_end + 1:end], None
+
+
+def tokenize_block(block: str) -> Dict:
+    """Tokenize one scene_block; the result matches the scene in the full script apart from its numbering"""
+    return next(iter_screenplay(block.split('\n')))
+
+
+def iter_elements(screenplay: Dict):
+    """Yield every element in script order, preamble first"""
+    yield from screenplay['preamble']
+    for scene in screenplay['scenes']:
+        yield {'type': HEADING, 'text': scene['heading'], 'line': scene['start_line']}
+        yield from scene['elements']
+
+
+def screenplay_text(screenplay: Dict) -> str:
+    """Source text of a tokenized screenplay, rebuilt from its elements if absent"""
+    if screenplay.get('text') is not None:
+        return screenplay['text']
+    return '\n'.join(element['text'] for element in iter_elements(screenplay))
@@ -0,0 +1,87 @@
+import argparse
+import json
+from typing import Dict, Iterable, List, Union
+
+import result_cache
+from budget_analyzer import add_budget_scene, analyze_budget, finish_budget_analysis, init_budget_analysis
+from camera_analyzer import add_camera_scene, analyze_camera_requirements, finish_camera_analysis, init_camera_analysis
+from character_analyzer import add_character_scene, analyze_characters, finish_character_analysis, init_character_analysis
+from scene_cache import flush as flush_scene_cache
+from screenplay_parser import as_screenplay, iter_scenes, mmap_lines, screenplay_text
+from suggestions_analyzer import (add_suggestions_scene, analyze_production_suggestions,
+                                  finish_suggestions_analysis, init_suggestions_analysis)
+
+# Section name -> analyzer, in output order
+SECTIONS = {
+    "characters": analyze_characters,
+    "budget": analyze_budget,
+    "camera": analyze_camera_requirements,
+    "suggestions": analyze_production_suggestions
+}
+
+# Section name -> (init, add scene, finish) used to fold scenes into several sections at once
+SCENE_FOLDS = {
+    "characters": (init_character_analysis, add_character_scene, finish_character_analysis),
+    "budget": (init_budget_analysis, add_budget_scene, finish_budget_analysis),
+    "camera": (init_camera_analysis, add_camera_scene, finish_camera_analysis),
+    "suggestions": (init_suggestions_analysis, add_suggestions_scene, finish_suggestions_analysis)
+}
+
+def analyze_script(script: Union[str, Dict, Iterable[str]]) -> Dict:
+    """Run every analyzer off a single parse and a single keyword scan of the script.
+
+    Each section is exactly what the matching analyzer returns on its own,
+    so callers can swap the individual endpoints for this one.  Sections
+    already in the result cache are reused; the rest are folded together,
+    scene by scene, and every scene is scanned for all analyzers' keywords
+    at once.  Open files and other line streams are analyzed as they are
+    read.
+    """
+    if not isinstance(script, (str, dict)):
+        return analyze_script_stream(script)
+
+    screenplay = as_screenplay(script)
+    script_text = screenplay_text(screenplay)
+
+    sections = {name: result_cache.lookup(analyzer, script_text) for name, analyzer in SECTIONS.items()}
+    missing = [name for name, section in sections.items() if section is result_cache.MISS]
+    if missing:
+        computed = fold_scenes(iter_scenes(screenplay), missing)
+        for name in missing:
+            result_cache.store(SECTIONS[name], script_text, computed[name])
+            sections[name] = computed[name]
+    return sections
+
+def analyze_script_stream(lines: Iterable[str]) -> Dict:
+    """Feed each scene to all analyzers as it is read, then drop it"""
+    return fold_scenes(iter_scenes(lines), list(SCENE_FOLDS))
+
+def fold_scenes(scenes: Iterable[Dict], names: List[str]) -> Dict:
+    """Fold every scene into each named section; the analyzers share each scene's keyword scan"""
+    folds = {name: SCENE_FOLDS[name] for name in names}
+    states = {name: init() for name, (init, _, _) in folds.items()}
+
+    for scene in scenes:
+        for name, (_, add_scene, _) in folds.items():
+            add_scene(states[name], scene)
+    flush_scene_cache()
+
+    return {name: finish(states[name]) for name, (_, _, finish) in folds.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every screenplay analyzer in one pass')
+    parser.add_argument('script', help='Path to the script file')
+    parser.add_argument('--mmap', action='store_true', help='Read the script through mmap')
+    
+    args = parser.parse_args()
+    
+    if args.mmap:
+        analysis = analyze_script(mmap_lines(args.script))
+    else:
+        with open(args.script, 'r') as f:
+            analysis = analyze_script(f)
+    
+    print(json.dumps(analysis, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,101 @@
 import os
 import json
 import argparse
+import asyncio
 import time
-import openai
 from dotenv import load_dotenv
 
+import llm_cache
+from llm_client import CHARS_PER_TOKEN, ChatClient, start_completions
+from progress_events import ProgressStream
+from screenplay_parser import CHARACTER, DIALOGUE, PARENTHETICAL, TRANSITION, as_screenplay
+from storyboard_journal import StoryboardJournal
+
 # Load environment variables
 load_dotenv()
 
-# Set up OpenAI API key
-openai.api_key = os.getenv('HF_API_TOKEN')
-if not openai.api_key:
+# Set up OpenAI API key (not needed when answering from the response cache alone)
+API_KEY = os.getenv('HF_API_TOKEN')
+if not API_KEY and llm_cache.MODES.get(os.getenv('LLM_CACHE', '').lower()) != 'only':
     raise ValueError("OpenAI API key not found in environment variables")
 
-def parse_screenplay(script_text):
+FRAME_SYSTEM_PROMPT = "You are a professional storyboard artist and cinematographer."
+FRAME_MAX_TOKENS = 150
+
+# Batched prompting: several consecutive scenes per request, sized to a token budget
+# (STORYBOARD_BATCH_TOKENS, prompt plus expected output; 0 sends one request per scene)
+BATCH_TOKENS = int(os.getenv('STORYBOARD_BATCH_TOKENS', '0'))
+MAX_BATCH_SCENES = 10
+# Room for the JSON wrapper around each description in a batched reply
+BATCH_OVERHEAD_TOKENS = 20
+BATCH_INSTRUCTIONS = (
+    "For each scene below, write a detailed visual description for a storyboard frame. "
+    "Focus on the key visual elements, camera angles, and mood. Keep each one concise but vivid.\n\n"
+    "Respond with only a JSON array holding one object per scene, in order: "
+    '[{"scene": <scene number>, "description": "<frame description>"}]'
+)
+
+def parse_screenplay(script):
     """Parse screenplay format to extract scenes with metadata"""
     scenes = []
-    current_scene = None
-    current_dialogue = []
-    current_action = []
     
-    lines = script_text.split('\n')
-    in_dialogue = False
-    in_parenthetical = False
-    
-    for line in lines:
-        line = line.strip()
+    for parsed_scene in as_screenplay(script)['scenes']:
+        line = parsed_scene['heading']
         
-        if line.startswith(('INT.', 'EXT.')):
-            if current_scene:
-                current_scene['dialogue'] = current_dialogue
-                current_scene['action'] = current_action
-                scenes.append(current_scene)
-            
-            # Parse scene heading for more details
-            time_of_day = ''
-            location = ''
-            if ' - ' in line:
-                location, time_of_day = line.split(' - ')
-            else:
-                location = line
-            
-            current_scene = {
-                'heading': line,
-                'location': location.strip(),
-                'time_of_day': time_of_day.strip(),
-                'description': [],
-                'dialogue': [],
-                'camera_shots': [],
-                'action': [],
-                'transitions': [],
-                'mood': '',
-                'characters': set()
-            }
-            current_dialogue = []
-            current_action = []
-            in_dialogue = False
-            in_parenthetical = False
+        # Parse scene heading for more details
+        time_of_day = ''
+        location = line
+        if ' - ' in line:
+            location, time_of_day = line.rsplit(' - ', 1)
+        
+        current_scene = {
+            'heading': line,
+            'location': location.strip(),
+            'time_of_day': time_of_day.strip(),
+            'description': [],
+            'dialogue': [],
+            'camera_shots': [],
+            'action': [],
+            'transitions': [],
+            'mood': '',
+            'characters': []
+        }
+        
+        for element in parsed_scene['elements']:
+            element_type = element['type']
+            text = element['text']
             
-        elif current_scene and line:
-            if line.startswith('(') and line.endswith(')'):
-                if in_dialogue:
+            if element_type == CHARACTER:
+                if element['name'] not in current_scene['characters']:
+                    current_scene['characters'].append(element['name'])
+                current_scene['dialogue'].append({
+                    'character': element['name'],
+                    'text': '',
+                    'parenthetical': '',
+                    'position': len(current_scene['description'])
+                })
+            elif element_type == DIALOGUE:
+                speech = current_scene['dialogue'][-1]
+                speech['text'] = f"{speech['text']} {text}" if speech['text'] else text
+            elif element_type == PARENTHETICAL:
+                if element['character']:
                     # This is a parenthetical for dialogue
-                    if current_dialogue:
-                        current_dialogue[-1]['parenthetical'] = line[1:-1]
-                    in_parenthetical = True
+                    current_scene['dialogue'][-1]['parenthetical'] = text[1:-1]
                 else:
                     # This is a camera direction or technical note
                     current_scene['camera_shots'].append({
-                        'shot': line[1:-1],
+                        'shot': text[1:-1],
                         'position': len(current_scene['description'])
                     })
-            elif line.isupper() and not line.startswith(('INT.', 'EXT.')):
-                if line.endswith('TO:') or line.endswith('WITH:') or line.endswith('IN:') or line.endswith('OUT:'):
-                    current_scene['transitions'].append(line)
-                else:
-                    in_dialogue = True
-                    current_scene['characters'].add(line)
-                    current_dialogue.append({
-                        'character': line,
-                        'text': '',
-                        'parenthetical': '',
-                        'position': len(current_scene['description'])
-                    })
-            elif in_dialogue and line and not in_parenthetical:
-                if current_dialogue:
-                    current_dialogue[-1]['text'] = line
-                in_dialogue = False
-            elif not in_dialogue and line:
-                current_scene['description'].append(line)
-                current_action.append({
-                    'text': line,
+            elif element_type == TRANSITION:
+                current_scene['transitions'].append(text)
+            else:
+                current_scene['description'].append(text)
+                current_scene['action'].append({
+                    'text': text,
                     'position': len(current_scene['description']) - 1
                 })
-            
-            in_parenthetical = False
-    
-    if current_scene:
-        current_scene['dialogue'] = current_dialogue
-        current_scene['action'] = current_action
-        current_scene['characters'] = list(current_scene['characters'])  # Convert set to list for JSON serialization
+        
         scenes.append(current_scene)
     
     # Add scene numbers and analyze mood
@@ -144,144 +140,253 @@ def analyze_scene(scene_text):
 Scene:
 {scene_text}"""
 
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{
-            "role": "system",
-            "content": "You are a professional cinematographer and storyboard artist. Analyze scenes and provide detailed shot descriptions."
-        }, {
-            "role": "user",
-            "content": prompt
-        }],
-        temperature=0.7
-    )
+    async def request():
+        client = ChatClient(API_KEY, cache=llm_cache.get_cache())
+        try:
+            return await client.complete(
+                model="gpt-4",
+                messages=[{
+                    "role": "system",
+                    "content": "You are a professional cinematographer and storyboard artist. Analyze scenes and provide detailed shot descriptions."
+                }, {
+                    "role": "user",
+                    "content": prompt
+                }],
+                temperature=0.7
+            )
+        finally:
+            client.close()
+
+    description = asyncio.run(request())
 
     return {
-        "description": response.choices[0].message.content,
+        "description": description,
         "original_text": scene_text
     }
 
-def generate_storyboard(script_path, output_dir):
-    """Generate storyboard from script"""
+def print_event(event):
+    """Default progress sink: one JSON document per line on stdout"""
+    print(json.dumps(event), flush=True)
+
+def frame_request(scene):
+    """Chat request for one storyboard frame description"""
+    prompt = f"Generate a detailed visual description for a storyboard frame of this scene:\n\nScene: {scene['heading']}\n\nDescription: {' '.join(scene['description'])}\n\nFocus on the key visual elements, camera angles, and mood. Keep it concise but vivid."
+    return {
+        'model': "gpt-3.5-turbo",
+        'messages': [
+            {"role": "system", "content": FRAME_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        'max_tokens': FRAME_MAX_TOKENS,
+        'temperature': 0.7
+    }
+
+def batch_scene_text(scene):
+    return f"Scene {scene['scene_number']}: {scene['heading']}\nDescription: {' '.join(scene['description'])}"
+
+def batch_request(batch):
+    """Chat request describing several scenes at once, answered as a JSON array"""
+    prompt = BATCH_INSTRUCTIONS + '\n\n' + '\n\n'.join(batch_scene_text(scene) for scene in batch)
+    return {
+        'model': "gpt-3.5-turbo",
+        'messages': [
+            {"role": "system", "content": FRAME_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        'max_tokens': (FRAME_MAX_TOKENS + BATCH_OVERHEAD_TOKENS) * len(batch),
+        'temperature': 0.7
+    }
+
+def batch_scenes(scenes, token_budget):
+    """Split scenes into runs of consecutive scenes whose prompt and expected reply fit the budget"""
+    fixed = (len(FRAME_SYSTEM_PROMPT) + len(BATCH_INSTRUCTIONS)) // CHARS_PER_TOKEN
+    batches = []
+    current = []
+    used = fixed
+
+    for scene in scenes:
+        cost = len(batch_scene_text(scene)) // CHARS_PER_TOKEN + FRAME_MAX_TOKENS + BATCH_OVERHEAD_TOKENS
+        if current and (used + cost > token_budget or len(current) == MAX_BATCH_SCENES):
+            batches.append(current)
+            current = []
+            used = fixed
+        current.append(scene)
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_batch_response(content, scene_numbers):
+    """Descriptions by scene number from a batched reply; ValueError unless every scene is there"""
+    # Tolerate prose or code fences around the array
+    start, end = content.find('['), content.rfind(']')
+    if start == -1 or end < start:
+        raise ValueError('No JSON array in batch response')
+
+    descriptions = {}
+    for item in json.loads(content[start:end + 1]):
+        if isinstance(item, dict) and isinstance(item.get('description'), str):
+            try:
+                descriptions[int(item.get('scene'))] = item['description']
+            except (TypeError, ValueError):
+                continue
+
+    missing = [number for number in scene_numbers if not descriptions.get(number, '').strip()]
+    if missing:
+        raise ValueError(f'Batch response is missing scenes {missing}')
+    return {number: descriptions[number] for number in scene_numbers}
+
+async def describe_batch(client, batch):
+    """Descriptions by scene number for one batch.
+
+    A reply that does not parse is not retried whole: the batch is split in
+    two and each half requested again, down to single scenes, which use the
+    plain one-scene prompt.  The reply is also dropped from the response
+    cache, so a later run asks for the batch again instead of replaying it.
+    """
+    if len(batch) == 1:
+        return {batch[0]['scene_number']: await client.complete(**frame_request(batch[0]))}
+
+    request = batch_request(batch)
+    content = await client.complete(**request)
+    try:
+        return parse_batch_response(content, [scene['scene_number'] for scene in batch])
+    except ValueError:
+        await client.forget(**request)
+        middle = len(batch) // 2
+        first, second = await asyncio.gather(describe_batch(client, batch[:middle]),
+                                             describe_batch(client, batch[middle:]))
+        return {**first, **second}
+
+async def batch_description(batch_future, scene_number):
+    return (await batch_future)[scene_number]
+
+def start_descriptions(client, scenes, batch_tokens):
+    """One future per scene resolving to its description; batched scenes share a request"""
+    if not batch_tokens:
+        return start_completions(client, [frame_request(scene) for scene in scenes])
+
+    completions = []
+    for batch in batch_scenes(scenes, batch_tokens):
+        batch_future = asyncio.ensure_future(describe_batch(client, batch))
+        completions.extend(asyncio.ensure_future(batch_description(batch_future, scene['scene_number']))
+                           for scene in batch)
+    return completions
+
+async def describe_scenes(scenes, journal, progress, batch_tokens=0):
+    """Request every frame concurrently, reporting results in scene order as they become available.
+
+    Scenes already in the journal (from an interrupted run) are reported
+    from there without a request; new frames are appended as they complete.
+    """
+    processed_scenes = []
+    total_scenes = len(scenes)
+    resumed = {scene['scene_number']: journal.resumed(scene) for scene in scenes}
+    pending = [scene for scene in scenes if resumed[scene['scene_number']] is None]
+
+    client = ChatClient(API_KEY, cache=llm_cache.get_cache())
+    completions = start_descriptions(client, pending, batch_tokens)
+    by_number = {scene['scene_number']: completion for scene, completion in zip(pending, completions)}
+
+    try:
+        for i, scene in enumerate(scenes, 1):
+            # Update progress
+            progress.update(i, f'Processing scene {i}/{total_scenes}')
+
+            if resumed[i] is not None:
+                processed_scenes.append(resumed[i])
+                progress.scene(resumed[i])
+                continue
+
+            try:
+                content = await by_number[i]
+            except Exception as e:
+                progress.scene_failed(i, f'Error processing scene {i}: {str(e)}')
+                continue
+
+            frame = {
+                'id': f'scene_{i}',
+                'scene_number': i,
+                'heading': scene['heading'],
+                'description': content.strip(),
+                'original_description': ' '.join(scene['description']),
+                'time_of_day': scene['time_of_day'],
+                'location': scene['location']
+            }
+            processed_scenes.append(frame)
+            journal.append(scene, frame)
+            progress.scene(frame)
+    finally:
+        for completion in completions:
+            completion.cancel()
+        client.close()
+        journal.close()
+
+    return processed_scenes
+
+def generate_storyboard(script_path, output_dir, script_text=None, emit=print_event, batch_tokens=None,
+                        resume=False):
+    """Generate storyboard from script file or from script text passed in directly.
+
+    ``emit`` receives progress_events.ProgressStream deltas: counters plus
+    the frames completed since the previous event, at a bounded rate.
+
+    Frame descriptions are requested concurrently (see llm_client.ChatClient
+    for the concurrency and rate limits) but reported in scene order.
+    Responses are cached on disk (llm_cache), so unchanged scenes are not
+    requested again; LLM_CACHE=only answers from the cache alone.  With
+    ``batch_tokens`` (default STORYBOARD_BATCH_TOKENS) consecutive scenes are
+    packed into one request of about that many tokens.
+
+    Completed frames go to an append-only journal in ``output_dir`` and are
+    compacted into storyboard.json at the end; with ``resume`` the scenes
+    an earlier, interrupted run already described are not requested again.
+    """
+    progress = ProgressStream(emit)
     try:
         # Read script file
-        with open(script_path, 'r', encoding='utf-8') as f:
-            script_text = f.read()
+        if script_text is None:
+            with open(script_path, 'r', encoding='utf-8') as f:
+                script_text = f.read()
         
         # Parse screenplay
         scenes = parse_screenplay(script_text)
+        progress.total = len(scenes)
+        progress.update(0, f'Found {len(scenes)} scenes')
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Process each scene
-        processed_scenes = []
-        total_scenes = len(scenes)
-        
-        for i, scene in enumerate(scenes, 1):
-            try:
-                # Update progress
-                progress = {
-                    'status': 'processing',
-                    'message': f'Processing scene {i}/{total_scenes}',
-                    'progress': (i / total_scenes) * 100,
-                    'scenes': processed_scenes
-                }
-                print(json.dumps(progress))
-                
-                # Generate scene description using OpenAI
-                prompt = f"Generate a detailed visual description for a storyboard frame of this scene:\n\nScene: {scene['heading']}\n\nDescription: {' '.join(scene['description'])}\n\nFocus on the key visual elements, camera angles, and mood. Keep it concise but vivid."
-                
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a professional storyboard artist and cinematographer."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=150,
-                    temperature=0.7
-                )
-                
-                scene_description = response.choices[0].message.content.strip()
-                
-                processed_scene = {
-                    'id': f'scene_{i}',
-                    'scene_number': i,
-                    'heading': scene['heading'],
-                    'description': scene_description,
-                    'original_description': ' '.join(scene['description']),
-                    'time_of_day': scene['time_of_day'],
-                    'location': scene['location']
-                }
-                
-                processed_scenes.append(processed_scene)
-                
-                # Save progress to file
-                with open(os.path.join(output_dir, 'storyboard.json'), 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'scenes': processed_scenes,
-                        'total_scenes': total_scenes,
-                        'current_scene': i
-                    }, f, indent=2)
-                
-            except Exception as e:
-                print(json.dumps({
-                    'status': 'error',
-                    'message': f'Error processing scene {i}: {str(e)}',
-                    'scenes': processed_scenes
-                }))
+        if batch_tokens is None:
+            batch_tokens = BATCH_TOKENS
+        journal = StoryboardJournal(output_dir, resume)
+        processed_scenes = asyncio.run(describe_scenes(scenes, journal, progress, batch_tokens))
+        journal.compact(processed_scenes, len(scenes))
         
         # Final update
-        print(json.dumps({
-            'status': 'complete',
-            'message': 'Storyboard generation complete',
-            'scenes': processed_scenes
-        }))
+        progress.finish('Storyboard generation complete')
+        
+        return processed_scenes
         
     except Exception as e:
-        print(json.dumps({
-            'status': 'error',
-            'message': f'Error generating storyboard: {str(e)}'
-        }))
+        progress.fail(f'Error generating storyboard: {str(e)}')
         raise
 
 def main():
     parser = argparse.ArgumentParser(description='Generate storyboard from screenplay')
     parser.add_argument('--script', required=True, help='Path to the script file')
     parser.add_argument('--output', required=True, help='Output directory for storyboard panels')
+    parser.add_argument('--resume', action='store_true', help='Keep the frames an interrupted run in the same output directory already described')
+    parser.add_argument('--batch-tokens', type=int, default=BATCH_TOKENS, help='Token budget per batched request (0 for one request per scene)')
     
     args = parser.parse_args()
     
+    # Every message, the scene count and the final status included, is a versioned progress
+    # event on stdout; generate_storyboard has already reported any error it raises
     try:
-        # Create output directory
-        os.makedirs(args.output, exist_ok=True)
-        
-        # Read script
-        with open(args.script, 'r') as f:
-            script_content = f.read()
-        
-        # Parse scenes
-        scenes = parse_screenplay(script_content)
-        print(f"Found {len(scenes)} scenes")
-        
-        # Process each scene
-        storyboard = generate_storyboard(args.script, args.output)
-        
-        # Save final storyboard
-        with open(os.path.join(args.output, 'storyboard.json'), 'w') as f:
-            json.dump(storyboard, f, indent=2)
-            
-        print(json.dumps({
-            "status": "completed",
-            "message": "Storyboard generation completed",
-            "scenes": storyboard
-        }))
-        
-    except Exception as e:
-        print(json.dumps({
-            "status": "error",
-            "message": str(e)
-        }))
+        generate_storyboard(args.script, args.output, batch_tokens=args.batch_tokens, resume=args.resume)
+    except Exception:
         exit(1)
 
 if __name__ == "__main__":
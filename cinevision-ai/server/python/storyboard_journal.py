@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+JOURNAL_NAME = 'storyboard.jsonl'
+STORYBOARD_NAME = 'storyboard.json'
+
+# Records are flushed to the OS on every append and fsynced in batches
+FSYNC_EVERY = 16
+FSYNC_INTERVAL = 1.0
+
+
+def scene_source(scene: Dict) -> str:
+    """Fingerprint of the script text a frame was described from, so resumes skip only unchanged scenes"""
+    text = json.dumps([scene['heading'], scene['description']])
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def read_journal(path: str) -> Tuple[List[Dict], int]:
+    """Records of a journal and the byte length of its intact part.
+
+    A crash can leave the last line half written; reading stops there.
+    """
+    records = []
+    valid = 0
+    if not os.path.exists(path):
+        return records, valid
+
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            valid += len(line)
+    return records, valid
+
+
+class StoryboardJournal:
+    """Append-only JSON-lines log of described scenes in a storyboard output directory.
+
+    Each completed scene is one line, so a run writes every frame once
+    instead of rewriting the whole storyboard after each scene, and a run
+    that dies part way can be resumed from what is already on disk.
+    ``compact`` writes the finished storyboard.json.
+    """
+
+    def __init__(self, output_dir: str, resume: bool = False):
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        self.output_dir = output_dir
+        self.completed = {}
+
+        if resume:
+            records, valid = read_journal(self.path)
+            for record in records:
+                self.completed[record['scene']['scene_number']] = record
+            self.file = open(self.path, 'ab')
+            # Drop a half-written last line so new records start on a line of their own
+            self.file.truncate(valid)
+        else:
+            self.file = open(self.path, 'wb')
+
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def resumed(self, scene: Dict):
+        """The journaled frame for a scene, if it was described from the same text"""
+        record = self.completed.get(scene['scene_number'])
+        if record and record['source'] == scene_source(scene):
+            return record['scene']
+        return None
+
+    def append(self, scene: Dict, frame: Dict):
+        self.file.write(json.dumps({'source': scene_source(scene), 'scene': frame}).encode('utf-8') + b'\n')
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= FSYNC_EVERY or time.monotonic() - self.synced_at >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def compact(self, frames: List[Dict], total_scenes: int):
+        """Write storyboard.json in one go; the journal is only kept while scenes are still missing"""
+        self.close()
+        path = os.path.join(self.output_dir, STORYBOARD_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'scenes': frames,
+                'total_scenes': total_scenes,
+                'current_scene': total_scenes
+            }, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+        if len(frames) == total_scenes:
+            os.remove(self.path)
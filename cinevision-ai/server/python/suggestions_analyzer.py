@@ -1,9 +1,77 @@
-import re
 import json
-from typing import Dict, List
+from typing import Dict, FrozenSet, Iterable, List, Union
 from collections import defaultdict
 
-def analyze_production_suggestions(script_text: str) -> Dict:
+from result_cache import cached_analysis
+from schedule_optimizer import build_schedule, strip_for_scene
+from scene_cache import memoize_scene, scene_pieces
+from scene_keywords import keyword_hits, register_keywords
+from screenplay_parser import is_preamble, scene_block
+
+ANALYZER_VERSION = 3
+
+# Seconds the schedule optimizer may spend per request; suggestions are interactive
+SCHEDULE_TIME_LIMIT = 0.5
+
+# Keywords (matched case-insensitively anywhere in a scene) behind the crew, safety and challenge analysis
+KEYWORD_CATEGORIES = {
+    'stunts': ['fight', 'explosion', 'chase', 'stunt', 'fall'],
+    'special_effects': ['effect', 'cgi', 'vfx', 'explosion', 'fire', 'rain'],
+    'period': ['century', 'period', 'historical', 'era', 'ancient', 'medieval'],
+    'combat': ['fight', 'combat'],
+    'fire': ['fire', 'explosion'],
+    'water': ['water', 'underwater', 'swimming'],
+    'heights': ['height', 'roof', 'cliff'],
+    'vehicles': ['vehicle', 'car chase'],
+    'crowds': ['crowd', 'extras', 'background'],
+    'weather': ['rain', 'snow', 'storm', 'sunny', 'weather'],
+    'public_locations': ['restaurant', 'hospital', 'school', 'public']
+}
+
+def index_keywords(categories: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Keyword -> categories it counts towards, so one scan covers every category"""
+    index = defaultdict(list)
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            index[keyword].append(category)
+    return dict(index)
+
+KEYWORD_INDEX = index_keywords(KEYWORD_CATEGORIES)
+register_keywords('suggestions', KEYWORD_INDEX)
+
+def init_suggestions_analysis() -> Dict:
+    # hit_matrix: scene number (0 for the preamble) -> categories found in that scene
+    return {"scenes": [], "hit_matrix": {}}
+
+def suggestions_scene_piece(scene: Dict) -> Dict:
+    """The scene's keyword categories and, for real scenes, its stripboard strip without the scene number"""
+    strip = None
+    if not is_preamble(scene):
+        strip = strip_for_scene(scene)
+        del strip['scene_number']
+    return {"hits": sorted(scene_categories(scene)), "strip": strip}
+
+def add_suggestions_piece(state: Dict, number: int, piece: Dict):
+    """Keep the heading facts scheduling needs and the scene's keyword hits, not its text"""
+    if piece["hits"]:
+        state["hit_matrix"][number] = frozenset(piece["hits"])
+    if piece["strip"] is not None:
+        state["scenes"].append(dict(piece["strip"], scene_number=number))
+
+def add_suggestions_scene(state: Dict, scene: Dict):
+    # Scenes whose text has not changed reuse their piece
+    piece = memoize_scene('suggestions', ANALYZER_VERSION, scene_block(scene), lambda _: suggestions_scene_piece(scene))
+    add_suggestions_piece(state, scene['scene_number'], piece)
+
+@cached_analysis('suggestions', ANALYZER_VERSION)
+def analyze_production_suggestions(script: Union[str, Dict, Iterable[str]]) -> Dict:
+    # Extract and analyze scenes
+    state = init_suggestions_analysis()
+    for number, piece in scene_pieces(script, 'suggestions', ANALYZER_VERSION, suggestions_scene_piece):
+        add_suggestions_piece(state, number, piece)
+    return finish_suggestions_analysis(state)
+
+def finish_suggestions_analysis(state: Dict) -> Dict:
     analysis = {
         "scheduling": {
             "estimated_days": 0,
@@ -22,66 +90,56 @@ def analyze_production_suggestions(script_text: str) -> Dict:
         },
         "safety_considerations": [],
         "production_challenges": [],
-        "optimization_suggestions": []
+        "optimization_suggestions": [],
+        "keyword_scenes": {}
     }
     
-    # Extract and analyze scenes
-    scenes = extract_scenes(script_text)
+    scenes = state["scenes"]
+    keyword_scenes = category_scenes(state["hit_matrix"])
+    analysis["keyword_scenes"] = keyword_scenes
     
     # Analyze scheduling
     analyze_scheduling(analysis, scenes)
     
     # Analyze crew requirements
-    analyze_crew_requirements(analysis, scenes, script_text)
+    analyze_crew_requirements(analysis, scenes, keyword_scenes)
     
     # Analyze logistics
     analyze_logistics(analysis, scenes)
     
     # Analyze safety considerations
-    analyze_safety(analysis, scenes, script_text)
+    analyze_safety(analysis, scenes, keyword_scenes)
     
     # Identify production challenges
-    identify_challenges(analysis, scenes, script_text)
+    identify_challenges(analysis, scenes, keyword_scenes)
     
     # Generate optimization suggestions
     generate_optimization_suggestions(analysis)
     
     return analysis
 
-def extract_scenes(script_text: str) -> List[Dict]:
-    scenes = []
-    scene_pattern = r'(INT\.|EXT\.|INT\/EXT\.)\s+(.+?)(?=\n|$)'
-    time_pattern = r'(?:DAWN|DAY|DUSK|NIGHT|MORNING|AFTERNOON|EVENING)'
-    
-    current_scene = None
-    current_scene_text = []
-    
-    for line in script_text.split('\n'):
-        scene_match = re.match(scene_pattern, line)
-        if scene_match:
-            if current_scene:
-                current_scene['content'] = '\n'.join(current_scene_text)
-                scenes.append(current_scene)
-            
-            location_time = scene_match.group(2)
-            time_match = re.search(time_pattern, location_time)
-            
-            current_scene = {
-                'location_type': scene_match.group(1),
-                'location': location_time.split('-')[0].strip() if '-' in location_time else location_time,
-                'time': time_match.group(0) if time_match else 'DAY',
-                'content': ''
-            }
-            current_scene_text = []
-        else:
-            if current_scene:
-                current_scene_text.append(line)
-    
-    if current_scene:
-        current_scene['content'] = '\n'.join(current_scene_text)
-        scenes.append(current_scene)
-    
-    return scenes
+def scene_categories(scene: Dict) -> FrozenSet[str]:
+    """Categories with at least one keyword in the scene, from the shared keyword scan"""
+    hits = set()
+    for keyword, _ in keyword_hits(scene, 'suggestions'):
+        hits.update(KEYWORD_INDEX[keyword])
+        if len(hits) == len(KEYWORD_CATEGORIES):
+            break
+    return frozenset(hits)
+
+def category_scenes(hit_matrix: Dict[int, FrozenSet[str]]) -> Dict[str, List[int]]:
+    """Invert the hit matrix: category -> scene numbers it was found in.
+
+    A category found only before the first scene heading maps to an empty
+    list, so membership still says whether the script mentions it at all.
+    """
+    scenes_by_category = {}
+    for scene_number, categories in sorted(hit_matrix.items()):
+        for category in categories:
+            numbers = scenes_by_category.setdefault(category, [])
+            if scene_number:
+                numbers.append(scene_number)
+    return {category: scenes_by_category[category] for category in KEYWORD_CATEGORIES if category in scenes_by_category}
 
 def analyze_scheduling(analysis: Dict, scenes: List[Dict]):
     # Group scenes by location
@@ -92,11 +150,11 @@ def analyze_scheduling(analysis: Dict, scenes: List[Dict]):
         location_groups[scene['location']].append(i + 1)
         time_groups[scene['time']].append(i + 1)
     
-    # Estimate shooting days
-    total_scenes = len(scenes)
-    estimated_days = max(round(total_scenes / 5), 1)  # Assume average of 5 scenes per day
+    # Order the scenes into shooting days
+    schedule = build_schedule(scenes, time_limit=SCHEDULE_TIME_LIMIT)
     
-    analysis["scheduling"]["estimated_days"] = estimated_days
+    analysis["scheduling"]["estimated_days"] = max(schedule["estimated_days"], 1)
+    analysis["scheduling"]["shooting_schedule"] = schedule
     
     # Create location groupings
     for location, scene_numbers in location_groups.items():
@@ -114,7 +172,7 @@ def analyze_scheduling(analysis: Dict, scenes: List[Dict]):
             "suggestion": f"Group scenes {', '.join(map(str, scene_numbers))} for {time.lower()} shoots"
         })
 
-def analyze_crew_requirements(analysis: Dict, scenes: List[Dict], script_text: str):
+def analyze_crew_requirements(analysis: Dict, scenes: List[Dict], keyword_scenes: Dict[str, List[int]]):
     # Standard departments
     departments = [
         {
@@ -143,24 +201,27 @@ def analyze_crew_requirements(analysis: Dict, scenes: List[Dict], script_text: s
     special_crew = []
     
     # Check for stunts
-    if re.search(r'fight|explosion|chase|stunt|fall', script_text, re.IGNORECASE):
+    if 'stunts' in keyword_scenes:
         special_crew.append({
             "role": "Stunt Coordinator",
-            "reason": "Action sequences detected"
+            "reason": "Action sequences detected",
+            "scene_numbers": keyword_scenes['stunts']
         })
     
     # Check for special effects
-    if re.search(r'effect|CGI|VFX|explosion|fire|rain', script_text, re.IGNORECASE):
+    if 'special_effects' in keyword_scenes:
         special_crew.append({
             "role": "Special Effects Supervisor",
-            "reason": "Special effects required"
+            "reason": "Special effects required",
+            "scene_numbers": keyword_scenes['special_effects']
         })
     
     # Check for period pieces
-    if re.search(r'century|period|historical|era|ancient|medieval', script_text, re.IGNORECASE):
+    if 'period' in keyword_scenes:
         special_crew.append({
             "role": "Historical Consultant",
-            "reason": "Period-specific content detected"
+            "reason": "Period-specific content detected",
+            "scene_numbers": keyword_scenes['period']
         })
     
     analysis["crew_requirements"]["departments"] = departments
@@ -205,24 +266,25 @@ def analyze_logistics(analysis: Dict, scenes: List[Dict]):
     analysis["logistics"]["equipment_logistics"] = equipment_logistics
     analysis["logistics"]["talent_logistics"] = talent_logistics
 
-def analyze_safety(analysis: Dict, scenes: List[Dict], script_text: str):
+def analyze_safety(analysis: Dict, scenes: List[Dict], keyword_scenes: Dict[str, List[int]]):
     safety_considerations = []
     
     # Check for dangerous scenes
     dangerous_elements = {
-        r'fight|combat': "Combat safety coordinator required",
-        r'fire|explosion': "Fire safety officer and permits required",
-        r'water|underwater|swimming': "Water safety team required",
-        r'height|roof|cliff': "Height safety equipment and coordinator required",
-        r'vehicle|car chase': "Vehicle safety coordinator required"
+        'combat': "Combat safety coordinator required",
+        'fire': "Fire safety officer and permits required",
+        'water': "Water safety team required",
+        'heights': "Height safety equipment and coordinator required",
+        'vehicles': "Vehicle safety coordinator required"
     }
     
-    for pattern, consideration in dangerous_elements.items():
-        if re.search(pattern, script_text, re.IGNORECASE):
+    for category, consideration in dangerous_elements.items():
+        if category in keyword_scenes:
             safety_considerations.append({
                 "type": "Safety Personnel",
                 "consideration": consideration,
-                "priority": "High"
+                "priority": "High",
+                "scene_numbers": keyword_scenes[category]
             })
     
     # Check for night shoots
@@ -236,33 +298,34 @@ def analyze_safety(analysis: Dict, scenes: List[Dict], script_text: str):
     
     analysis["safety_considerations"] = safety_considerations
 
-def identify_challenges(analysis: Dict, scenes: List[Dict], script_text: str):
+def identify_challenges(analysis: Dict, scenes: List[Dict], keyword_scenes: Dict[str, List[int]]):
     challenges = []
     
     # Check for complex scenes
-    if re.search(r'crowd|extras|background', script_text, re.IGNORECASE):
+    if 'crowds' in keyword_scenes:
         challenges.append({
             "type": "Crowd Management",
             "description": "Scenes requiring large number of extras",
-            "suggestion": "Consider hiring crowd coordinator and additional ADs"
+            "suggestion": "Consider hiring crowd coordinator and additional ADs",
+            "scene_numbers": keyword_scenes['crowds']
         })
     
     # Check for weather-dependent scenes
-    weather_scenes = re.findall(r'rain|snow|storm|sunny|weather', script_text, re.IGNORECASE)
-    if weather_scenes:
+    if 'weather' in keyword_scenes:
         challenges.append({
             "type": "Weather Dependency",
             "description": "Scenes requiring specific weather conditions",
-            "suggestion": "Plan for weather contingencies and consider VFX alternatives"
+            "suggestion": "Plan for weather contingencies and consider VFX alternatives",
+            "scene_numbers": keyword_scenes['weather']
         })
     
     # Check for complex locations
-    complex_locations = re.findall(r'restaurant|hospital|school|public', script_text, re.IGNORECASE)
-    if complex_locations:
+    if 'public_locations' in keyword_scenes:
         challenges.append({
             "type": "Location Permissions",
             "description": "Scenes in complex or public locations",
-            "suggestion": "Start location scouting and permitting process early"
+            "suggestion": "Start location scouting and permitting process early",
+            "scene_numbers": keyword_scenes['public_locations']
         })
     
     analysis["production_challenges"] = challenges
@@ -304,7 +367,6 @@ if __name__ == "__main__":
         sys.exit(1)
         
     with open(sys.argv[1], 'r') as f:
-        script_text = f.read()
-        
-    analysis = analyze_production_suggestions(script_text)
+        analysis = analyze_production_suggestions(f)
+
     print(json.dumps(analysis, indent=2))
@@ -0,0 +1,120 @@
+import argparse
+import random
+from typing import List
+
+LOCATIONS = [
+    'LIVING ROOM', 'KITCHEN', 'OFFICE', 'CITY STREET', 'PARK', 'RESTAURANT', 'HOSPITAL CORRIDOR',
+    'ROOFTOP', 'WAREHOUSE', 'APARTMENT', 'CAFE', 'SCHOOL GYM', 'POLICE STATION', 'BEACH', 'FOREST ROAD'
+]
+TIMES = {'day': ['DAY', 'MORNING', 'AFTERNOON', 'DAWN'], 'night': ['NIGHT', 'EVENING', 'DUSK']}
+FIRST_NAMES = [
+    'JOHN', 'SARAH', 'MIKE', 'ANNA', 'DAVID', 'LUCY', 'OMAR', 'PRIYA', 'CARLOS', 'MEI', 'TOM', 'NINA',
+    'FRANK', 'ZOE', 'VICTOR', 'HANNA', 'LEO', 'GRACE', 'IVAN', 'ROSA'
+]
+EXTENSIONS = ['', '', '', '', ' (V.O.)', ' (O.S.)', " (CONT'D)"]
+PARENTHETICALS = ['(quietly)', '(beat)', '(smiling)', '(angry)', '(into phone)', '(whispering)']
+TRANSITIONS = ['CUT TO:', 'DISSOLVE TO:', 'SMASH CUT TO:', 'MATCH CUT TO:']
+ACTION_FRAGMENTS = [
+    '{a} walks across the room and stops by the window.',
+    '{a} holds a phone, staring at the screen.',
+    'A wide establishing view of the area as traffic moves past.',
+    'Close up on {a}\'s hands, shaking slightly.',
+    '{a} and {b} exchange a long look.',
+    'The camera follows {a} through the crowd.',
+    'Rain starts to fall against the glass.',
+    'An explosion rattles the walls. Smoke fills the air.',
+    '{a} picks up a book from the table and leafs through it.',
+    'A car chase tears down the road, sirens wailing.',
+    'Aerial shot over the rooftops as the sun sets.',
+    '{a} runs toward the exit, {b} right behind.',
+    'A fight breaks out near the bar. Extras scatter.',
+    '{a} laughs, the tension finally breaking.',
+    '{a} sits in silence, tears in her eyes.',
+    'Lightning flashes. The storm is getting worse.',
+    '{a} types on a laptop, the glow lighting her face.',
+    'Background extras fill the restaurant, chatting over dinner.'
+]
+DIALOGUE_LINES = [
+    'I told you this would happen.', 'We need to leave. Now.', 'Where were you last night?',
+    'It\'s not what you think.', 'Give me one good reason.', 'I can\'t do this anymore.',
+    'Did you hear that?', 'Keep your voice down.', 'This changes everything.', 'Trust me.',
+    'How long have you known?', 'We don\'t have much time.', 'You should have called.', 'Fine. Go.'
+]
+
+
+def cast_names(count: int) -> List[str]:
+    """Distinct all-caps character names, numbered once the name list runs out"""
+    names = []
+    for i in range(count):
+        base = FIRST_NAMES[i % len(FIRST_NAMES)]
+        names.append(base if i < len(FIRST_NAMES) else f'{base} {i // len(FIRST_NAMES) + 1}')
+    return names
+
+
+def generate_screenplay(scenes: int = 100, characters: int = 12, dialogue_density: float = 4.0,
+                        interior_ratio: float = 0.6, night_ratio: float = 0.35,
+                        action_lines: int = 3, seed: int = 0) -> str:
+    """Build a plausible screenplay for benchmarking.
+
+    ``dialogue_density`` is the average number of speeches per scene,
+    ``interior_ratio`` and ``night_ratio`` control the INT/EXT and DAY/NIGHT
+    mix.  The same arguments always produce the same text.
+    """
+    rng = random.Random(seed)
+    cast = cast_names(max(1, characters))
+    locations = LOCATIONS + [f'{name}\'S HOUSE' for name in cast[:10]]
+    lines = ['FADE IN:', '']
+
+    for _ in range(scenes):
+        location_type = 'INT.' if rng.random() < interior_ratio else 'EXT.'
+        time_of_day = rng.choice(TIMES['night'] if rng.random() < night_ratio else TIMES['day'])
+        lines += [f'{location_type} {rng.choice(locations)} - {time_of_day}', '']
+
+        # Lead characters speak far more often than the rest of the cast
+        present = sorted({min(int(rng.paretovariate(1.2)) - 1, len(cast) - 1) for _ in range(4)})
+        speakers = [cast[i] for i in present] or [cast[0]]
+
+        for _ in range(max(1, int(rng.gauss(action_lines, 1)))):
+            a, b = rng.choice(speakers), rng.choice(cast)
+            lines += [rng.choice(ACTION_FRAGMENTS).format(a=a.title(), b=b.title()), '']
+
+        for _ in range(max(0, int(rng.expovariate(1 / dialogue_density)) if dialogue_density else 0)):
+            lines.append(rng.choice(speakers) + rng.choice(EXTENSIONS))
+            if rng.random() < 0.2:
+                lines.append(rng.choice(PARENTHETICALS))
+            lines.append(rng.choice(DIALOGUE_LINES))
+            if rng.random() < 0.3:
+                lines.append(rng.choice(DIALOGUE_LINES))
+            lines.append('')
+            if rng.random() < 0.25:
+                lines += [rng.choice(ACTION_FRAGMENTS).format(a=rng.choice(speakers).title(), b=rng.choice(cast).title()), '']
+
+        if rng.random() < 0.3:
+            lines += [rng.choice(TRANSITIONS), '']
+
+    lines += ['FADE OUT.', '']
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic screenplay for benchmarks')
+    parser.add_argument('--scenes', type=int, default=100, help='Number of scenes')
+    parser.add_argument('--characters', type=int, default=12, help='Number of speaking characters')
+    parser.add_argument('--dialogue-density', type=float, default=4.0, help='Average speeches per scene')
+    parser.add_argument('--interior-ratio', type=float, default=0.6, help='Share of INT. scenes')
+    parser.add_argument('--night-ratio', type=float, default=0.35, help='Share of night scenes')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    args = parser.parse_args()
+
+    text = generate_screenplay(args.scenes, args.characters, args.dialogue_density,
+                               args.interior_ratio, args.night_ratio, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text, end='')
+
+if __name__ == "__main__":
+    main()
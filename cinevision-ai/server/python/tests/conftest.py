@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The analyzers are plain modules run from this directory, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_cache  # noqa: E402
+import scene_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_analysis_caches():
+    """Keep tests off the shared cache directory; tests that need a cache configure one under tmp_path"""
+    result_cache.configure(enabled=False)
+    scene_cache.configure(enabled=False)
+    yield
+    result_cache.configure(enabled=False)
+    scene_cache.configure(enabled=False)
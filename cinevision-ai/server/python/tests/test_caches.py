@@ -0,0 +1,81 @@
+import os
+
+import result_cache
+import scene_cache
+from result_cache import MISS, ResultCache, cached_analysis
+from scene_cache import SceneCache
+
+SCRIPT = 'INT. KITCHEN - DAY\n\nA kettle boils.'
+
+
+def test_result_cache_misses_after_a_version_bump(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path)
+    cache.put('budget', 1, SCRIPT, {'total': 10})
+
+    assert cache.get('budget', 1, SCRIPT) == {'total': 10}
+    assert cache.get('budget', 2, SCRIPT) is MISS
+    assert cache.get('budget', 1, SCRIPT + ' ') is MISS
+
+    # The disk tier keys by version too
+    reopened = ResultCache(path)
+    assert reopened.get('budget', 1, SCRIPT) == {'total': 10}
+    assert reopened.get('budget', 2, SCRIPT) is MISS
+    assert reopened.stats()['disk_hits'] == 1
+
+
+def test_cached_analysis_recomputes_after_a_version_bump(tmp_path):
+    result_cache.configure(path=str(tmp_path / 'results.sqlite'))
+    calls = []
+
+    def analyze(script):
+        calls.append(script)
+        return {'length': len(script)}
+
+    first = cached_analysis('length', 1)(analyze)
+    assert first(SCRIPT) == first(SCRIPT) == {'length': len(SCRIPT)}
+    assert len(calls) == 1
+
+    bumped = cached_analysis('length', 2)(analyze)
+    assert bumped(SCRIPT) == {'length': len(SCRIPT)}
+    assert len(calls) == 2
+
+
+def test_scene_cache_recomputes_after_a_version_bump(tmp_path):
+    path = str(tmp_path / 'pieces.sqlite')
+    calls = []
+
+    def compute(text):
+        calls.append(text)
+        return [len(text)]
+
+    cache = SceneCache(path)
+    assert cache.get_or_compute('camera', '2', SCRIPT, compute) == [len(SCRIPT)]
+    assert cache.get_or_compute('camera', '2', SCRIPT, compute) == [len(SCRIPT)]
+    assert cache.get_or_compute('camera', '2+underwater', SCRIPT, compute) == [len(SCRIPT)]
+    assert cache.get_or_compute('budget', '2', SCRIPT, compute) == [len(SCRIPT)]
+    assert len(calls) == 3
+    cache.flush()
+
+    reopened = SceneCache(path)
+    reopened.get_or_compute('camera', '2', SCRIPT, compute)
+    reopened.get_or_compute('camera', '3', SCRIPT, compute)
+    assert len(calls) == 4
+    assert reopened.stats() == {'entries': 2, 'memory_hits': 0, 'disk_hits': 1, 'misses': 1}
+
+
+def test_scene_pieces_only_recompute_edited_scenes(tmp_path):
+    scene_cache.configure(path=str(tmp_path / 'pieces.sqlite'))
+    script = 'INT. KITCHEN - DAY\n\nA kettle boils.\n\nEXT. GARDEN - NIGHT\n\nRain.'
+    summarized = []
+
+    def summarize(scene):
+        summarized.append(scene['heading'])
+        return scene['heading']
+
+    assert list(scene_cache.scene_pieces(script, 'test', 1, summarize)) == \
+        [(1, 'INT. KITCHEN - DAY'), (2, 'EXT. GARDEN - NIGHT')]
+    list(scene_cache.scene_pieces(script.replace('Rain.', 'Snow.'), 'test', 1, summarize))
+
+    assert summarized == ['INT. KITCHEN - DAY', 'EXT. GARDEN - NIGHT', 'EXT. GARDEN - NIGHT']
+    assert os.path.exists(tmp_path / 'pieces.sqlite')
@@ -0,0 +1,41 @@
+from budget_analyzer import analyze_budget
+from character_analyzer import analyze_characters
+
+SCRIPT = """INT. KITCHEN - DAY
+
+JOHN (O.S.)
+Anyone home?
+
+(CLOSE UP)
+A kettle on the stove.
+
+MARY
+(whispering)
+In here.
+
+JOHN (CONT'D)
+Coming.
+"""
+
+
+def test_cue_extensions_count_towards_the_bare_name():
+    characters = {character['name']: character for character in analyze_characters(SCRIPT)}
+
+    assert set(characters) == {'JOHN', 'MARY'}
+    assert characters['JOHN']['dialogueCount'] == 2
+    assert characters['JOHN']['sampleDialogues'] == ['Anyone home?', 'Coming.']
+
+
+def test_parenthetical_lines_are_not_characters():
+    characters = [character['name'] for character in analyze_characters(SCRIPT)]
+
+    assert '(CLOSE UP)' not in characters
+    # A cue followed by a parenthetical is still a speech
+    assert 'MARY' in characters
+
+
+def test_budget_casts_the_same_speakers():
+    budget = analyze_budget(SCRIPT)
+
+    assert [member['name'] for member in budget['cast']['details']] == ['JOHN', 'MARY']
+    assert [costume['character'] for costume in budget['costumes']['details']] == ['JOHN', 'MARY']
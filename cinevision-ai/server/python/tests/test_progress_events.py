@@ -0,0 +1,77 @@
+import threading
+
+from progress_events import PROGRESS_VERSION, ProgressStream
+
+
+def test_events_carry_only_new_scenes():
+    events = []
+    stream = ProgressStream(events.append, total=3, max_rate=0)
+
+    stream.update(1, 'Describing scene 1')
+    stream.scene({'scene_number': 1})
+    stream.scene_failed(2, 'timed out')
+    stream.scene({'scene_number': 3})
+    stream.finish('Storyboard generation complete')
+
+    assert all(event['version'] == PROGRESS_VERSION for event in events)
+    assert [event.get('scenes') for event in events] == [None, [{'scene_number': 1}], None, [{'scene_number': 3}], None]
+    assert events[2]['errors'] == [{'scene_number': 2, 'message': 'timed out'}]
+    assert events[-1] == {
+        'version': PROGRESS_VERSION,
+        'status': 'complete',
+        'message': 'Storyboard generation complete',
+        'current': 3,
+        'total': 3,
+        'completed': 2,
+        'failed': 1,
+        'progress': 100.0
+    }
+
+
+def test_fast_updates_are_coalesced():
+    events = []
+    sent = threading.Event()
+
+    def emit(event):
+        events.append(event)
+        sent.set()
+
+    stream = ProgressStream(emit, total=10, max_rate=2)
+    stream.update(0, 'Starting')
+    sent.clear()
+    for number in range(1, 6):
+        stream.update(number, f'Describing scene {number}')
+        stream.scene({'scene_number': number})
+
+    # Everything after the first event waits for the timer and goes out as one
+    assert sent.wait(5)
+    assert len(events) == 2
+    assert events[1]['message'] == 'Describing scene 5'
+    assert events[1]['completed'] == 5
+    assert [frame['scene_number'] for frame in events[1]['scenes']] == [1, 2, 3, 4, 5]
+
+
+def test_finish_flushes_pending_scenes():
+    events = []
+    stream = ProgressStream(events.append, total=2, max_rate=0.001)
+
+    stream.update(0, 'Starting')
+    stream.scene({'scene_number': 1})
+    stream.scene({'scene_number': 2})
+    stream.finish('Done')
+
+    assert [event['status'] for event in events] == ['processing', 'complete']
+    assert [frame['scene_number'] for frame in events[1]['scenes']] == [1, 2]
+    assert stream.timer is None
+
+
+def test_fail_reports_an_error_event():
+    events = []
+    stream = ProgressStream(events.append, total=4, max_rate=0)
+
+    stream.update(2, 'Describing scene 2')
+    stream.fail('Model unavailable')
+
+    assert events[-1]['status'] == 'error'
+    assert events[-1]['message'] == 'Model unavailable'
+    assert events[-1]['progress'] == 50.0
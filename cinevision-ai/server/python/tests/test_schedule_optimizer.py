@@ -0,0 +1,87 @@
+import random
+import time
+
+from schedule_optimizer import build_schedule, schedule_metrics
+
+
+def unique_location_strips(count, seed=0):
+    rng = random.Random(seed)
+    cast = ['LEAD'] + [f'ACTOR {number}' for number in range(60)]
+    strips = []
+    for number in range(1, count + 1):
+        names = (['LEAD'] if rng.random() < 0.8 else []) + rng.sample(cast[1:], rng.randint(0, 4))
+        strips.append({
+            'scene_number': number,
+            'location_type': 'INT',
+            'location': f'PLACE {number}',
+            'time': rng.choice(['DAY', 'NIGHT', 'DUSK']),
+            'eighths': rng.randint(1, 24),
+            'cast': names
+        })
+    return strips
+
+
+def test_every_scene_at_its_own_location_schedules_quickly():
+    strips = unique_location_strips(5000)
+
+    started = time.perf_counter()
+    schedule = build_schedule(strips)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 10
+    scheduled = [number for day in schedule['days'] for number in day['scene_numbers']]
+    assert sorted(scheduled) == list(range(1, 5001))
+
+    metrics = schedule['metrics']
+    # Every strip is a location of its own, so each day moves between all of its strips
+    assert metrics['company_moves'] == sum(len(day['scene_numbers']) - 1 for day in schedule['days'])
+    # Day blocks and night blocks are shot in two runs
+    assert metrics['day_night_flips'] <= 2
+    assert all(day['pages'] <= 5.0 or len(day['scene_numbers']) == 1 for day in schedule['days'])
+
+
+def test_time_limit_covers_the_greedy_pass():
+    started = time.perf_counter()
+    schedule = build_schedule(unique_location_strips(5000), time_limit=0)
+
+    assert time.perf_counter() - started < 2
+    # Out of time from the start, so the blocks keep script order
+    scheduled = [number for day in schedule['days'] for number in day['scene_numbers']]
+    assert scheduled == list(range(1, 5001))
+
+
+def strip(number, location, time_of_day, cast, eighths=8):
+    return {'scene_number': number, 'location_type': 'INT', 'location': location, 'time': time_of_day,
+            'eighths': eighths, 'cast': cast}
+
+
+def test_schedule_metrics_count_moves_flips_and_carry_days():
+    days = [
+        [strip(1, 'KITCHEN', 'DAY', ['ANNA']), strip(2, 'KITCHEN', 'NIGHT', ['ANNA']), strip(3, 'GARDEN', 'DUSK', [])],
+        [strip(4, 'GARDEN', 'DAY', ['BEN'])],
+        [strip(5, 'ROOF', 'DAY', ['ANNA', 'BEN'])]
+    ]
+
+    # DUSK counts as a night shift; ANNA is held on day 2, BEN works days 2 and 3 back to back
+    assert schedule_metrics(days) == {'company_moves': 1, 'day_night_flips': 1, 'cast_carry_days': 1}
+
+
+def test_small_script_groups_locations_and_fills_days():
+    strips = [
+        strip(1, 'KITCHEN', 'DAY', ['ANNA']),
+        strip(2, 'GARDEN', 'NIGHT', ['BEN']),
+        strip(3, 'KITCHEN', 'DAY', ['ANNA']),
+        strip(4, 'GARDEN', 'NIGHT', ['BEN']),
+        strip(5, 'KITCHEN', 'DAY', ['ANNA', 'BEN'])
+    ]
+
+    schedule = build_schedule(strips, pages_per_day=2)
+
+    assert schedule['estimated_days'] == 3
+    assert [day['pages'] for day in schedule['days']] == [2.0, 2.0, 1.0]
+    scheduled = [number for day in schedule['days'] for number in day['scene_numbers']]
+    assert sorted(scheduled) == [1, 2, 3, 4, 5]
+    # The kitchen scenes are shot in one run and the garden scenes in another, so the
+    # only move and flip fall on the day that changes over from one to the other
+    assert [day['scene_numbers'] for day in schedule['days']] == [[1, 3], [5, 2], [4]]
+    assert schedule['metrics'] == {'company_moves': 1, 'day_night_flips': 1, 'cast_carry_days': 0}
@@ -0,0 +1,81 @@
+from screenplay_parser import (ACTION, CHARACTER, DIALOGUE, PARENTHETICAL, is_preamble, iter_scenes, scene_block,
+                               scene_blocks, tokenize_block, tokenize_screenplay)
+
+SCRIPT = """THE LONG NIGHT
+by A. Writer
+
+FADE IN:
+
+INT. KITCHEN - DAY
+
+JOHN (V.O.)
+(quietly)
+Anyone home?
+
+INT. HALLWAY - NIGHT
+EXT. GARDEN -- DUSK
+
+MARY
+Out here.
+"""
+
+
+def test_preamble_comes_first_as_scene_zero():
+    scenes = list(iter_scenes(SCRIPT))
+
+    assert is_preamble(scenes[0])
+    assert scenes[0]['scene_number'] == 0
+    assert [element['text'] for element in scenes[0]['elements']] == ['THE LONG NIGHT', 'by A. Writer', 'FADE IN:']
+    assert [scene['scene_number'] for scene in scenes[1:]] == [1, 2, 3]
+
+    screenplay = tokenize_screenplay(SCRIPT)
+    assert screenplay['preamble'] == scenes[0]['elements']
+    assert [scene['location'] for scene in screenplay['scenes']] == ['KITCHEN', 'HALLWAY', 'GARDEN']
+
+
+def test_no_preamble_without_text_before_the_first_heading():
+    scenes = list(iter_scenes('INT. KITCHEN - DAY\n\nA kettle boils.'))
+
+    assert [scene['scene_number'] for scene in scenes] == [1]
+
+
+def test_cue_extension_is_stripped_from_the_speaker():
+    kitchen = tokenize_screenplay(SCRIPT)['scenes'][0]
+    elements = [element for element in kitchen['elements'] if element['type'] != ACTION]
+
+    assert [element['type'] for element in elements] == [CHARACTER, PARENTHETICAL, DIALOGUE]
+    assert elements[0]['text'] == 'JOHN (V.O.)'
+    assert elements[0]['name'] == 'JOHN'
+    assert elements[1]['character'] == elements[2]['character'] == 'JOHN'
+
+
+def test_heading_with_no_body():
+    hallway, garden = tokenize_screenplay(SCRIPT)['scenes'][1:]
+
+    assert hallway['start_line'] == hallway['end_line']
+    assert hallway['elements'] == []
+    assert hallway['content'] == ''
+    assert scene_block(hallway) == 'INT. HALLWAY - NIGHT'
+    assert garden['time'] == 'DUSK'
+
+
+def test_heading_followed_by_a_blank_line_is_not_an_empty_block():
+    scene = tokenize_screenplay('INT. HALLWAY - NIGHT\n\nINT. KITCHEN - DAY')['scenes'][0]
+
+    assert scene['end_line'] == scene['start_line'] + 1
+    assert scene_block(scene) == 'INT. HALLWAY - NIGHT\n'
+
+
+def test_raw_blocks_match_the_tokenized_scenes():
+    tokenized = list(iter_scenes(SCRIPT))
+    blocks = list(scene_blocks(SCRIPT))
+
+    assert [number for number, _, _ in blocks] == [scene['scene_number'] for scene in tokenized]
+    assert [block for _, block, _ in blocks] == [scene_block(scene) for scene in tokenized]
+
+    for (number, block, scene), expected in zip(blocks[1:], tokenized[1:]):
+        assert scene is None
+        rebuilt = tokenize_block(block)
+        assert rebuilt['elements'] == [dict(element, line=element['line'] - expected['start_line'] + 1)
+                                       for element in expected['elements']]
+        assert rebuilt['content'] == expected['content']
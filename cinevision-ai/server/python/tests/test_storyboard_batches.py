@@ -0,0 +1,58 @@
+import asyncio
+import json
+import os
+
+os.environ.setdefault('HF_API_TOKEN', 'test-token')
+
+from llm_cache import ResponseCache
+from llm_client import ChatClient
+from storyboard_generator import batch_request, describe_batch
+
+
+def scenes(*numbers):
+    return [{'scene_number': number, 'heading': f'INT. ROOM {number} - DAY', 'description': ['A kettle boils.']}
+            for number in numbers]
+
+
+class ScriptedClient(ChatClient):
+    """Answers batched prompts from a list of replies and single scenes with a fixed line"""
+
+    def __init__(self, cache, batch_replies):
+        super().__init__('test-token', cache=cache, requests_per_minute=6000, tokens_per_minute=10 ** 7)
+        self.batch_replies = list(batch_replies)
+
+    def post(self, path, body):
+        prompt = body['messages'][-1]['content']
+        content = self.batch_replies.pop(0) if 'JSON array' in prompt else 'Single frame'
+        return {'choices': [{'message': {'content': content}}]}
+
+
+def describe(cache, batch, replies):
+    async def run():
+        client = ScriptedClient(cache, replies)
+        try:
+            return await describe_batch(client, batch), client.network_calls
+        finally:
+            client.close()
+    return asyncio.run(run())
+
+
+def test_unparsable_batch_reply_is_not_replayed_from_the_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+    batch = scenes(1, 2)
+    request = batch_request(batch)
+
+    descriptions, calls = describe(cache, batch, ['[{"scene": 1, "descr'])
+    assert descriptions == {1: 'Single frame', 2: 'Single frame'}
+    assert calls == 3
+    assert cache.get(request['model'], request['messages'], request['temperature'], request['max_tokens']) is None
+
+    good = json.dumps([{'scene': 1, 'description': 'Frame one'}, {'scene': 2, 'description': 'Frame two'}])
+    descriptions, calls = describe(cache, batch, [good])
+    assert descriptions == {1: 'Frame one', 2: 'Frame two'}
+    assert calls == 1
+
+    # A good reply stays cached
+    descriptions, calls = describe(cache, batch, [])
+    assert descriptions == {1: 'Frame one', 2: 'Frame two'}
+    assert calls == 0
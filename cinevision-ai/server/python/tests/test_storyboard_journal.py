@@ -0,0 +1,80 @@
+import json
+import os
+
+from storyboard_journal import JOURNAL_NAME, STORYBOARD_NAME, StoryboardJournal, read_journal
+
+
+def scene(number, description='A kettle boils.'):
+    return {'scene_number': number, 'heading': f'INT. ROOM {number} - DAY', 'description': description}
+
+
+def frame(number):
+    return {'scene_number': number, 'image_prompt': f'Frame {number}'}
+
+
+def test_resume_drops_a_half_written_line(tmp_path):
+    journal = StoryboardJournal(str(tmp_path))
+    journal.append(scene(1), frame(1))
+    journal.append(scene(2), frame(2))
+    journal.close()
+
+    path = tmp_path / JOURNAL_NAME
+    intact = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(b'{"source": "abc", "scene": {"scene_nu')
+
+    records, valid = read_journal(str(path))
+    assert [record['scene']['scene_number'] for record in records] == [1, 2]
+    assert valid == intact
+
+    resumed = StoryboardJournal(str(tmp_path), resume=True)
+    assert path.stat().st_size == intact
+    resumed.append(scene(3), frame(3))
+    resumed.close()
+
+    # The new record starts on a line of its own
+    records, valid = read_journal(str(path))
+    assert [record['scene']['scene_number'] for record in records] == [1, 2, 3]
+    assert valid == path.stat().st_size
+
+
+def test_resume_skips_only_unchanged_scenes(tmp_path):
+    journal = StoryboardJournal(str(tmp_path))
+    journal.append(scene(1), frame(1))
+    journal.append(scene(2), frame(2))
+    journal.close()
+
+    resumed = StoryboardJournal(str(tmp_path), resume=True)
+    assert resumed.resumed(scene(1)) == frame(1)
+    assert resumed.resumed(scene(2, 'The kettle boils over.')) is None
+    assert resumed.resumed(scene(3)) is None
+    resumed.close()
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    journal = StoryboardJournal(str(tmp_path))
+    journal.append(scene(1), frame(1))
+    journal.close()
+
+    fresh = StoryboardJournal(str(tmp_path))
+    assert fresh.resumed(scene(1)) is None
+    fresh.close()
+    assert read_journal(str(tmp_path / JOURNAL_NAME)) == ([], 0)
+
+
+def test_compact_keeps_the_journal_until_every_scene_is_in(tmp_path):
+    journal = StoryboardJournal(str(tmp_path))
+    journal.append(scene(1), frame(1))
+    journal.compact([frame(1)], 2)
+
+    with open(tmp_path / STORYBOARD_NAME) as f:
+        assert json.load(f) == {'scenes': [frame(1)], 'total_scenes': 2, 'current_scene': 2}
+    assert os.path.exists(tmp_path / JOURNAL_NAME)
+
+    journal = StoryboardJournal(str(tmp_path), resume=True)
+    journal.append(scene(2), frame(2))
+    journal.compact([frame(1), frame(2)], 2)
+
+    with open(tmp_path / STORYBOARD_NAME) as f:
+        assert json.load(f)['scenes'] == [frame(1), frame(2)]
+    assert not os.path.exists(tmp_path / JOURNAL_NAME)
@@ -6,6 +6,7 @@ const path = require('path');
 const fs = require('fs').promises;
 const axios = require('axios');
 const os = require('os');
+const readline = require('readline');
 
 const app = express();
 
@@ -195,9 +196,112 @@ async function analyzeCameraAndLights(scriptText) {
   return analysis;
 }
 
-// Store storyboard generation progress
+// Long-lived Python analysis worker (JSON lines over stdin/stdout)
+const analysisJobs = new Map();
+let analysisWorker = null;
+let nextJobId = 1;
+
+function startAnalysisWorker() {
+  const worker = spawn('python3', [
+    path.join(__dirname, 'python', 'analysis_worker.py'),
+    '--workers', String(process.env.ANALYSIS_WORKERS || Math.min(4, os.cpus().length))
+  ], { cwd: path.join(__dirname, 'python') });
+
+  readline.createInterface({ input: worker.stdout }).on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      console.error('Error parsing analysis worker output:', line);
+      return;
+    }
+
+    const job = analysisJobs.get(message.id);
+    if (!job) return;
+
+    if (message.type === 'progress') {
+      if (job.onProgress) job.onProgress(message.data);
+    } else if (message.type === 'result') {
+      analysisJobs.delete(message.id);
+      job.resolve(message.result);
+    } else if (message.type === 'error') {
+      analysisJobs.delete(message.id);
+      job.reject(new Error(message.error));
+    }
+  });
+
+  worker.stderr.on('data', (data) => {
+    console.error(`Analysis worker: ${data}`);
+  });
+
+  // Spawn failures (e.g. ENOENT) and writes to a worker that already died arrive as
+  // 'error' events, which would crash the server if nothing listened for them
+  worker.on('error', (err) => {
+    console.error('Analysis worker error:', err);
+    failAnalysisWorker(worker, `Analysis worker failed: ${err.message}`);
+  });
+
+  worker.stdin.on('error', (err) => {
+    console.error('Error writing to analysis worker:', err);
+    failAnalysisWorker(worker, `Analysis worker unavailable: ${err.message}`);
+    worker.kill();
+  });
+
+  worker.on('close', (code) => {
+    console.error(`Analysis worker exited with code ${code}`);
+    failAnalysisWorker(worker, 'Analysis worker exited');
+  });
+
+  return worker;
+}
+
+// Fail everything still in flight on a worker; the next request starts a fresh one
+function failAnalysisWorker(worker, reason) {
+  if (analysisWorker === worker) {
+    analysisWorker = null;
+  }
+  for (const [id, job] of analysisJobs) {
+    if (job.worker === worker) {
+      analysisJobs.delete(id);
+      job.reject(new Error(reason));
+    }
+  }
+}
+
+// Send a job to the worker and resolve with its result
+function runAnalysisJob(task, scriptText, { outputDir, options, onProgress } = {}) {
+  if (!analysisWorker) {
+    analysisWorker = startAnalysisWorker();
+  }
+
+  const id = nextJobId++;
+  const worker = analysisWorker;
+  return new Promise((resolve, reject) => {
+    analysisJobs.set(id, { resolve, reject, onProgress, worker });
+    worker.stdin.write(JSON.stringify({ id, task, scriptText, outputDir, options }) + '\n', (err) => {
+      if (err && analysisJobs.delete(id)) {
+        reject(new Error(`Analysis worker unavailable: ${err.message}`));
+      }
+    });
+  });
+}
+
+// Store storyboard generation progress: the latest counters plus every scene received so far,
+// so a client that connects late starts from a snapshot and then gets the same deltas
 const storyboardProgress = new Map();
 
+// Kept this long for a client that connects after the job already ended
+const FINISHED_PROGRESS_TTL_MS = 60 * 1000;
+
+function isFinishedStatus(status) {
+  return status === 'complete' || status === 'completed' || status === 'error';
+}
+
+function storyboardSnapshot(progress) {
+  const { res, ...snapshot } = progress;
+  return snapshot;
+}
+
 // Progress endpoint
 app.get('/api/generate/storyboard/progress/:id', (req, res) => {
   const id = req.params.id;
@@ -209,13 +313,19 @@ app.get('/api/generate/storyboard/progress/:id', (req, res) => {
   
   // Get progress data
   const progress = storyboardProgress.get(id) || {
+    version: 2,
     status: 'processing',
     message: 'Starting storyboard generation...',
-    panels: []
+    scenes: [],
+    errors: []
   };
   
   // Send initial progress
-  res.write(`data: ${JSON.stringify(progress)}\n\n`);
+  res.write(`data: ${JSON.stringify(storyboardSnapshot(progress))}\n\n`);
+  if (isFinishedStatus(progress.status)) {
+    storyboardProgress.delete(id);
+    return res.end();
+  }
   
   // Store the response object
   storyboardProgress.set(id, { ...progress, res });
@@ -230,15 +340,23 @@ app.get('/api/generate/storyboard/progress/:id', (req, res) => {
   });
 });
 
-// Update storyboard progress
+// Update storyboard progress with one delta event from the worker
 function updateStoryboardProgress(id, data) {
-  const progress = storyboardProgress.get(id);
-  if (progress && progress.res) {
+  id = String(id);
+  const progress = storyboardProgress.get(id) || { scenes: [], errors: [] };
+  const { scenes = [], errors = [], ...counters } = data;
+  progress.scenes.push(...scenes);
+  progress.errors.push(...errors);
+  storyboardProgress.set(id, Object.assign(progress, counters));
+
+  if (progress.res) {
     progress.res.write(`data: ${JSON.stringify(data)}\n\n`);
-    if (data.status === 'completed' || data.status === 'error') {
+    if (isFinishedStatus(data.status)) {
       progress.res.end();
       storyboardProgress.delete(id);
     }
+  } else if (isFinishedStatus(data.status)) {
+    setTimeout(() => storyboardProgress.delete(id), FINISHED_PROGRESS_TTL_MS);
   }
 }
 
@@ -274,47 +392,8 @@ app.post('/api/analyze/characters', async (req, res) => {
       return res.status(400).json({ error: 'No script text provided' });
     }
     
-    // Create a temporary directory for analysis
-    const timestamp = Date.now();
-    const tempDir = path.join(__dirname, 'temp', `analysis_${timestamp}`);
-    await fs.mkdir(tempDir, { recursive: true });
-    
-    // Save the script to a temporary file
-    const scriptPath = path.join(tempDir, 'script.txt');
-    await fs.writeFile(scriptPath, scriptText);
-    
-    // Run the Python script for character analysis
-    const pythonProcess = spawn('python3', [
-      path.join(__dirname, 'python', 'character_analyzer.py'),
-      '--script', scriptPath
-    ]);
-    
-    let outputData = '';
-    
-    pythonProcess.stdout.on('data', (data) => {
-      outputData += data;
-    });
-    
-    pythonProcess.stderr.on('data', (data) => {
-      console.error(`Character analysis error: ${data}`);
-    });
-    
-    pythonProcess.on('close', async (code) => {
-      try {
-        // Clean up temporary files
-        await fs.rm(tempDir, { recursive: true });
-        
-        if (code === 0) {
-          const characters = JSON.parse(outputData);
-          res.json({ characters });
-        } else {
-          res.status(500).json({ error: 'Failed to analyze characters' });
-        }
-      } catch (err) {
-        console.error('Error in character analysis:', err);
-        res.status(500).json({ error: 'Failed to process character analysis results' });
-      }
-    });
+    const characters = await runAnalysisJob('characters', scriptText);
+    res.json({ characters });
     
   } catch (error) {
     console.error('Error in character analysis:', error);
@@ -330,46 +409,28 @@ app.post('/api/analyze/budget', async (req, res) => {
       return res.status(400).json({ error: 'No script text provided' });
     }
 
-    // Save script to temporary file
-    const scriptFile = path.join(os.tmpdir(), `script_${Date.now()}.txt`);
-    await fs.writeFile(scriptFile, scriptText);
-
-    // Run budget analysis
-    const pythonProcess = spawn('python3', [
-      path.join(__dirname, 'python', 'budget_analyzer.py'),
-      scriptFile
-    ]);
-
-    let result = '';
-    let error = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      result += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      error += data.toString();
-    });
+    const budget = await runAnalysisJob('budget', scriptText);
+    res.json(budget);
 
-    await new Promise((resolve, reject) => {
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Budget analysis failed: ${error}`));
-        } else {
-          resolve();
-        }
-      });
-    });
+  } catch (error) {
+    console.error('Error in budget analysis:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
 
-    // Clean up temporary file
-    await fs.unlink(scriptFile);
+// Budget risk simulation: P10/P50/P90 totals per category alongside the point estimate
+app.post('/api/analyze/budget/simulation', async (req, res) => {
+  try {
+    const { scriptText, trials, seed } = req.body;
+    if (!scriptText) {
+      return res.status(400).json({ error: 'No script text provided' });
+    }
 
-    // Parse and send the result
-    const budget = JSON.parse(result);
-    res.json(budget);
+    const result = await runAnalysisJob('budget_simulation', scriptText, { options: { trials, seed } });
+    res.json(result);
 
   } catch (error) {
-    console.error('Error in budget analysis:', error);
+    console.error('Error in budget simulation:', error);
     res.status(500).json({ error: error.message });
   }
 });
@@ -382,42 +443,7 @@ app.post('/api/analyze/camera', async (req, res) => {
       return res.status(400).json({ error: 'No script text provided' });
     }
 
-    // Save script to temporary file
-    const scriptFile = path.join(os.tmpdir(), `script_${Date.now()}.txt`);
-    await fs.writeFile(scriptFile, scriptText);
-
-    // Run camera analysis
-    const pythonProcess = spawn('python3', [
-      path.join(__dirname, 'python', 'camera_analyzer.py'),
-      scriptFile
-    ]);
-
-    let result = '';
-    let error = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      result += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      error += data.toString();
-    });
-
-    await new Promise((resolve, reject) => {
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Camera analysis failed: ${error}`));
-        } else {
-          resolve();
-        }
-      });
-    });
-
-    // Clean up temporary file
-    await fs.unlink(scriptFile);
-
-    // Parse and send the result
-    const analysis = JSON.parse(result);
+    const analysis = await runAnalysisJob('camera', scriptText);
     res.json(analysis);
 
   } catch (error) {
@@ -434,46 +460,39 @@ app.post('/api/analyze/suggestions', async (req, res) => {
       return res.status(400).json({ error: 'No script text provided' });
     }
 
-    // Save script to temporary file
-    const scriptFile = path.join(os.tmpdir(), `script_${Date.now()}.txt`);
-    await fs.writeFile(scriptFile, scriptText);
-
-    // Run suggestions analysis
-    const pythonProcess = spawn('python3', [
-      path.join(__dirname, 'python', 'suggestions_analyzer.py'),
-      scriptFile
-    ]);
-
-    let result = '';
-    let error = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      result += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      error += data.toString();
-    });
+    const analysis = await runAnalysisJob('suggestions', scriptText);
+    res.json(analysis);
 
-    await new Promise((resolve, reject) => {
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Suggestions analysis failed: ${error}`));
-        } else {
-          resolve();
-        }
-      });
-    });
+  } catch (error) {
+    console.error('Error in suggestions analysis:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
 
-    // Clean up temporary file
-    await fs.unlink(scriptFile);
+// Combined Analysis Endpoint (characters, budget, camera and suggestions off one parse)
+app.post('/api/analyze/all', async (req, res) => {
+  try {
+    const { scriptText } = req.body;
+    if (!scriptText) {
+      return res.status(400).json({ error: 'No script text provided' });
+    }
 
-    // Parse and send the result
-    const analysis = JSON.parse(result);
+    const analysis = await runAnalysisJob('all', scriptText);
     res.json(analysis);
 
   } catch (error) {
-    console.error('Error in suggestions analysis:', error);
+    console.error('Error in combined analysis:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
+
+// Analysis result cache hit/miss counters
+app.get('/api/analyze/cache-stats', async (req, res) => {
+  try {
+    const stats = await runAnalysisJob('cache_stats');
+    res.json(stats);
+  } catch (error) {
+    console.error('Error reading cache stats:', error);
     res.status(500).json({ error: error.message });
   }
 });
@@ -493,54 +512,23 @@ app.post('/api/generate/storyboard', async (req, res) => {
     // Create a temporary directory for this generation
     const timestamp = Date.now();
     const tempDir = path.join(__dirname, 'temp', `storyboard_${timestamp}`);
-    await fs.mkdir(tempDir, { recursive: true });
-    
-    // Save the script to a temporary file
-    const scriptPath = path.join(tempDir, 'script.txt');
-    await fs.writeFile(scriptPath, scriptText);
-    
-    // Create output directory
     const outputDir = path.join(tempDir, 'output');
     await fs.mkdir(outputDir, { recursive: true });
     
     // Send initial response
     res.json({ message: 'Analysis started', id: timestamp });
     
-    // Run the Python script
-    const pythonProcess = spawn('python3', [
-      path.join(__dirname, 'python', 'storyboard_generator.py'),
-      scriptPath,
-      outputDir
-    ]);
-    
-    pythonProcess.stdout.on('data', (data) => {
-      try {
-        const message = data.toString().trim();
-        if (message.startsWith('{')) {
-          const progressData = JSON.parse(message);
-          updateStoryboardProgress(timestamp, progressData);
-        }
-      } catch (err) {
-        console.error('Error parsing Python output:', err);
-      }
-    });
-    
-    pythonProcess.stderr.on('data', (data) => {
-      console.error('Python error:', data.toString());
+    // Run the storyboard job on the analysis worker
+    runAnalysisJob('storyboard', scriptText, {
+      outputDir,
+      onProgress: (progressData) => updateStoryboardProgress(timestamp, progressData)
+    }).catch((error) => {
+      console.error('Python error:', error.message);
       updateStoryboardProgress(timestamp, {
         status: 'error',
-        message: 'Error analyzing script: ' + data.toString()
+        message: 'Error analyzing script: ' + error.message
       });
-    });
-    
-    pythonProcess.on('close', async (code) => {
-      if (code !== 0) {
-        updateStoryboardProgress(timestamp, {
-          status: 'error',
-          message: `Script analysis failed with code ${code}`
-        });
-      }
-      
+    }).finally(async () => {
       // Clean up temp files
       try {
         await fs.rm(tempDir, { recursive: true });
@@ -92,7 +92,23 @@ const CharacterAnalysis = ({ scriptContent }) => {
               <Typography sx={{ mb: 1 }}>
                 <strong>Lines:</strong> {character.lineCount}
               </Typography>
-              
+
+              {character.scenes?.length > 0 && (
+                <Typography sx={{ mb: 1 }}>
+                  <strong>Scenes:</strong> {character.scenes.length}
+                </Typography>
+              )}
+
+              {character.interactions?.length > 0 && (
+                <Typography sx={{ mb: 1 }}>
+                  <strong>Most scenes with:</strong>{' '}
+                  {character.interactions
+                    .slice(0, 5)
+                    .map(partner => `${partner.name} (${partner.sharedScenes})`)
+                    .join(', ')}
+                </Typography>
+              )}
+
               {character.sampleDialogues?.length > 0 && (
                 <>
                   <Typography sx={{ mb: 1 }}>
@@ -121,8 +121,18 @@ const StoryboardGenerator = ({ onScriptUpload }) => {
             return;
           }
           
-          if (data.scenes) {
-            setScenes(data.scenes);
+          // Per-scene failures do not stop the run
+          if (data.errors?.length) {
+            setError(data.errors[data.errors.length - 1].message);
+          }
+
+          if (data.scenes?.length) {
+            // Events carry only the scenes completed since the previous one (the first may be a snapshot)
+            setScenes(prev => {
+              const merged = new Map(prev.map(scene => [scene.id, scene]));
+              data.scenes.forEach(scene => merged.set(scene.id, scene));
+              return [...merged.values()].sort((a, b) => a.scene_number - b.scene_number);
+            });
             // Generate images for each scene that doesn't have an image yet
             for (const scene of data.scenes) {
               if (!generatedImages[scene.id]) {